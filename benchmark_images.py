@@ -0,0 +1,133 @@
+"""
+Benchmark of the image processing done when replacing a texture.
+Times the sleeve fade border and the preparation of the texture handed to the encoder
+against the implementations they replaced, and fails if their output differs.
+
+Usage: python benchmark_images.py
+"""
+
+import io
+import sys
+from time import perf_counter
+
+import numpy as np
+from PIL import Image, ImageColor, ImageOps
+
+from util.image_utils import add_sleeve_border_with_fade, to_texture_image
+
+# Size of a sleeve texture, the per pixel baseline is too slow for larger ones
+SLEEVE_SIZE: tuple[int, int] = (512, 734)
+TEXTURE_SIZE: tuple[int, int] = (2048, 2048)
+BORDER_COLOR: str = "#3C78D8"
+REPEATS: int = 3
+
+
+def baseline_sleeve_border_with_fade(image: Image.Image, color: str) -> Image.Image:
+    """Fade border as it was computed before, visiting each pixel of the content."""
+    border_width = int(image.width * 0.05)
+    border_height = int(image.height * 0.04)
+    r, g, b = ImageColor.getrgb(color)[:3]
+    border_color = np.array([r, g, b, 255], dtype=np.float32)
+
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+
+    result = ImageOps.expand(image, border=(border_width, border_height), fill=color)
+    result_array = np.array(result).astype(np.float32)
+    original_array = np.array(image).astype(np.float32)
+    fade_distance = min(border_width, border_height) * 2.0
+
+    for y in range(image.height):
+        for x in range(image.width):
+            distance = min(x, image.width - 1 - x, y, image.height - 1 - y)
+
+            if distance < fade_distance:
+                base = distance / fade_distance
+                smooth1 = base * base * (3.0 - 2.0 * base)
+                smooth2 = smooth1 * smooth1 * (3.0 - 2.0 * smooth1)
+                fade = 1.0 - np.exp(-4.0 * smooth2)
+                result_array[y + border_height, x + border_width] = (
+                    1 - fade
+                ) * border_color + fade * original_array[y, x]
+
+    return Image.fromarray(result_array.astype(np.uint8), "RGBA")
+
+
+def baseline_texture_bytes(img: Image.Image) -> bytes:
+    """RGBA bytes the encoder got before, after a PNG round trip of the image."""
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return Image.open(buffer).convert("RGBA").tobytes()
+
+
+def texture_bytes(img: Image.Image) -> bytes:
+    """RGBA bytes the encoder gets now."""
+    return to_texture_image(img).tobytes()
+
+
+def noise(size: tuple[int, int], mode: str) -> Image.Image:
+    """Random image, so neither PNG compression nor the fade get an easy input."""
+    channels = len(mode)
+    pixels = np.random.default_rng(0).integers(
+        0, 256, (size[1], size[0], channels), dtype=np.uint8
+    )
+    return Image.fromarray(pixels, mode)
+
+
+def best_time(function, *args) -> tuple[float, object]:
+    """Runs a function REPEATS times, returning its best time in ms and its result."""
+    best, result = float("inf"), None
+
+    for _ in range(REPEATS):
+        start = perf_counter()
+        result = function(*args)
+        best = min(best, (perf_counter() - start) * 1000)
+
+    return best, result
+
+
+def compare(name: str, baseline, current, *args) -> bool:
+    """Prints the timings of both implementations, returns whether they agree."""
+    baseline_ms, expected = best_time(baseline, *args)
+    current_ms, actual = best_time(current, *args)
+
+    if isinstance(expected, Image.Image):
+        expected, actual = expected.tobytes(), actual.tobytes()
+
+    matches = expected == actual
+    print(
+        f"{name:<28} {baseline_ms:>9.0f} ms -> {current_ms:>7.0f} ms  "
+        f"{'identical' if matches else 'OUTPUT DIFFERS'}"
+    )
+
+    return matches
+
+
+def main() -> int:
+    results = [
+        compare(
+            "Sleeve fade border (RGBA)",
+            baseline_sleeve_border_with_fade,
+            add_sleeve_border_with_fade,
+            noise(SLEEVE_SIZE, "RGBA"),
+            BORDER_COLOR,
+        ),
+        compare(
+            "Texture bytes (RGBA)",
+            baseline_texture_bytes,
+            texture_bytes,
+            noise(TEXTURE_SIZE, "RGBA"),
+        ),
+        compare(
+            "Texture bytes (RGB)",
+            baseline_texture_bytes,
+            texture_bytes,
+            noise(TEXTURE_SIZE, "RGB"),
+        ),
+    ]
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
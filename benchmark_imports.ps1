@@ -0,0 +1,24 @@
+Write-Output "Measuring import times..."
+
+New-Item -ItemType Directory -Force -Path .\reports | Out-Null
+
+# Cumulative import time of everything loaded before the main window is built
+python -X importtime -c "import pages.main_window" 2> .\reports\importtime.txt
+
+Get-Content .\reports\importtime.txt |
+    Select-Object -Skip 1 |
+    ForEach-Object {
+        $fields = $_.Split("|")
+        [PSCustomObject]@{
+            Cumulative = [int]$fields[1].Trim()
+            Module     = $fields[2].TrimEnd()
+        }
+    } |
+    Sort-Object Cumulative -Descending |
+    Select-Object -First 25 |
+    Format-Table -AutoSize
+
+# Modules that must stay deferred until first use
+python -c "import sys, pages.main_window; loaded = [m for m in ('UnityPy', 'pyarrow', 'requests') if m in sys.modules]; print('Eagerly imported:', loaded or 'none'); sys.exit(bool(loaded))"
+
+Write-Output "Full report written to reports\importtime.txt"
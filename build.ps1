@@ -9,6 +9,9 @@ pyinstaller `
     --icon "./qtdesigner/images/icon.ico" `
     --add-data "$unityPyPath;UnityPy/" `
     --add-data "pages/ui;pages/ui/" `
-    --hidden-import "fastparquet" `
+    --hidden-import "UnityPy" `
+    --hidden-import "pyarrow.compute" `
+    --hidden-import "pyarrow.parquet" `
+    --hidden-import "requests" `
     --name "Floowandereeze & Modding - Duel Links" `
     .\main.py
\ No newline at end of file
@@ -2,14 +2,57 @@
 Database migration utilities for handling schema changes between versions.
 This module ensures that database schema changes are applied automatically
 when users update to a new version of the application.
+
+Migrations are numbered by their position in `MIGRATIONS` and the number of the last one
+applied is stored in the database `PRAGMA user_version`, so a current database is
+detected with a single pragma and nothing else runs. Every migration still checks the
+schema before changing it, since databases created before the versioning have their
+user_version at 0 whatever migrations they went through.
 """
 
-import sqlite3
 import logging
-from typing import List, Tuple
+from time import perf_counter
+from typing import Callable, List
+
+from database.objects import engine
 
 logger = logging.getLogger(__name__)
 
+# FTS5 index over the card names and bundles, using the card table as its content
+CARD_SEARCH_SCHEMA: str = """
+CREATE VIRTUAL TABLE card_search USING fts5(
+    name, small_bundle, medium_bundle, large_bundle,
+    content = 'card', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER card_search_insert AFTER INSERT ON card BEGIN
+    INSERT INTO card_search(rowid, name, small_bundle, medium_bundle, large_bundle)
+    VALUES (new.id, new.name, new.small_bundle, new.medium_bundle, new.large_bundle);
+END;
+
+CREATE TRIGGER card_search_delete AFTER DELETE ON card BEGIN
+    INSERT INTO card_search(
+        card_search, rowid, name, small_bundle, medium_bundle, large_bundle
+    )
+    VALUES (
+        'delete', old.id, old.name, old.small_bundle, old.medium_bundle, old.large_bundle
+    );
+END;
+
+CREATE TRIGGER card_search_update
+AFTER UPDATE OF name, small_bundle, medium_bundle, large_bundle ON card BEGIN
+    INSERT INTO card_search(
+        card_search, rowid, name, small_bundle, medium_bundle, large_bundle
+    )
+    VALUES (
+        'delete', old.id, old.name, old.small_bundle, old.medium_bundle, old.large_bundle
+    );
+    INSERT INTO card_search(rowid, name, small_bundle, medium_bundle, large_bundle)
+    VALUES (new.id, new.name, new.small_bundle, new.medium_bundle, new.large_bundle);
+END;
+"""
+
 
 def get_columns(cursor, table_name: str) -> List[str]:
     """Get list of column names for a table."""
@@ -17,37 +60,136 @@ def get_columns(cursor, table_name: str) -> List[str]:
     return [column[1] for column in cursor.fetchall()]
 
 
-def run_migrations(db_path: str = "database.db") -> None:
+def _add_background_mode(cursor) -> None:
+    """Add background_mode column to app_config"""
+    if "background_mode" not in get_columns(cursor, "app_config"):
+        cursor.execute(
+            "ALTER TABLE app_config ADD COLUMN background_mode VARCHAR(10) DEFAULT 'stretched'"
+        )
+
+
+def _add_texture_digest(cursor) -> None:
+    """Add digest column to texture_hash"""
+    # Only if the table was already created by a previous version
+    columns = get_columns(cursor, "texture_hash")
+    if columns and "digest" not in columns:
+        cursor.execute("ALTER TABLE texture_hash ADD COLUMN digest VARCHAR(32)")
+        # Forces the indexer to hash every bundle again so the digests get filled
+        cursor.execute("UPDATE texture_hash SET mtime = -1")
+
+
+def _add_color_statistics(cursor) -> None:
+    """Add color statistics columns to sleeve and field"""
+    for table in ("sleeve", "field"):
+        columns = get_columns(cursor, table)
+        for column, column_type in (
+            ("dominant_color", "VARCHAR(7)"),
+            ("color_family", "INTEGER"),
+            ("luminance", "FLOAT"),
+            ("color_histogram", "BLOB"),
+        ):
+            if columns and column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _add_card_search(cursor) -> None:
+    """Add the card_search full-text index"""
+    # Kept in sync with the card table by triggers so every write (updates included)
+    # reaches it
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'card_search'"
+    )
+    if not cursor.fetchone():
+        cursor.executescript(CARD_SEARCH_SCHEMA)
+        cursor.execute("INSERT INTO card_search(card_search) VALUES ('rebuild')")
+
+
+def _add_filter_indexes(cursor) -> None:
+    """Add indexes on the card name and the favorite flags"""
+    # The bundle columns are unique, so SQLite already indexes them
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_card_name ON card (name)")
+    for table in ("sleeve", "card", "field"):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_favorite ON {table} (favorite)"
+        )
+
+
+def _add_color_digest(cursor) -> None:
+    """Add color_digest column to sleeve and field"""
+    for table in ("sleeve", "field"):
+        columns = get_columns(cursor, table)
+        if columns and "color_digest" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN color_digest VARCHAR(32)")
+
+
+def _add_indexed_bundle(cursor) -> None:
+    """Add the indexed_bundle table, filled from the bundles already hashed"""
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS indexed_bundle "
+        "(bundle VARCHAR(8) NOT NULL PRIMARY KEY, mtime FLOAT NOT NULL)"
+    )
+    if get_columns(cursor, "texture_hash"):
+        cursor.execute(
+            "INSERT OR IGNORE INTO indexed_bundle (bundle, mtime) "
+            "SELECT bundle, MAX(mtime) FROM texture_hash GROUP BY bundle"
+        )
+
+
+# Every migration in order, append new ones at the end and never reorder them
+MIGRATIONS: List[Callable] = [
+    _add_background_mode,
+    _add_texture_digest,
+    _add_color_statistics,
+    _add_card_search,
+    _add_filter_indexes,
+    _add_color_digest,
+    _add_indexed_bundle,
+]
+
+
+def run_migrations() -> None:
     """
     Run all necessary database migrations.
 
-    This function checks the current database schema and applies
-    any missing migrations to bring it up to the latest version.
+    This function reads the schema version of the database and applies the
+    migrations after it, recording how long each one took, to bring it up to the
+    latest version. Nothing else is done when it is already current.
     """
+    connection = engine.raw_connection()
+
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        cursor = connection.cursor()
+
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migration ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(100), "
+            "duration_ms FLOAT, applied_at DATETIME)"
+        )
 
-        # Migration 1: Add background_mode column to app_config
-        columns = get_columns(cursor, "app_config")
-        if "background_mode" not in columns:
-            logger.info("Migrating database: Adding background_mode column")
+        for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+            logger.info(f"Migrating database: {migration.__doc__} ({number})")
+            start = perf_counter()
+
+            migration(cursor)
+
+            duration = (perf_counter() - start) * 1000
             cursor.execute(
-                "ALTER TABLE app_config ADD COLUMN background_mode VARCHAR(10) DEFAULT 'stretched'"
+                "INSERT OR REPLACE INTO schema_migration "
+                "VALUES (?, ?, ?, datetime('now'))",
+                (number, migration.__name__, duration),
             )
-            conn.commit()
-            logger.info("Migration completed: background_mode column added")
-
-        # Add future migrations here following the same pattern
-        # Migration 2: Example for future use
-        # if "some_future_column" not in get_columns(cursor, "some_table"):
-        #     cursor.execute("ALTER TABLE some_table ADD COLUMN some_future_column ...")
-        #     conn.commit()
+            cursor.execute(f"PRAGMA user_version = {number}")
+            connection.commit()
 
-        conn.close()
+            logger.info(f"Migration {number} completed in {duration:.0f} ms")
     except Exception as e:
         logger.error(f"Database migration failed: {e}")
-        if "conn" in locals():
-            conn.close()
+        connection.rollback()
         # Don't re-raise the exception - we want the app to continue even if migration fails
         # The user might not be able to use new features, but at least the app will run
+    finally:
+        connection.close()
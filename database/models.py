@@ -7,7 +7,7 @@ including configuration, card data, and various UI assets.
 from typing import ClassVar
 
 from PySide6.QtGui import QIcon
-from sqlalchemy import String, Integer, Boolean, LargeBinary, Text
+from sqlalchemy import String, Integer, BigInteger, Boolean, Float, LargeBinary, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database.objects import base, engine
@@ -29,10 +29,29 @@ class UnityAsset:
     """
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    favorite: Mapped[bool] = mapped_column(Boolean, default=False)
+    favorite: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     has_backup: Mapped[bool] = mapped_column(Boolean, default=False)
 
 
+class ColoredAsset:
+    """
+    Mixin for assets whose color statistics are stored for filtering and sorting.
+
+    The statistics are computed from the asset thumbnail when its texture changes:
+    - dominant_color: Mean color of the most common color family, as a hex string
+    - color_family: Value of the dominant `ColorFamily`
+    - luminance: Mean luminance of the thumbnail, from 0 to 1
+    - color_histogram: One byte per `ColorFamily`, fraction of the pixels * 255
+    - color_digest: Digest of the thumbnail the statistics were computed from
+    """
+
+    dominant_color: Mapped[str] = mapped_column(String(7), nullable=True)
+    color_family: Mapped[int] = mapped_column(Integer, nullable=True)
+    luminance: Mapped[float] = mapped_column(Float, nullable=True)
+    color_histogram: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    color_digest: Mapped[str] = mapped_column(String(32), nullable=True)
+
+
 class AppConfig(base):
     """
     Application configuration model.
@@ -57,12 +76,13 @@ class AppConfig(base):
     background_mode: Mapped[str] = mapped_column(String(10), default="stretched")
 
 
-class SleeveModel(UnityAsset, base):
+class SleeveModel(UnityAsset, ColoredAsset, base):
     """
     Model for card sleeve assets.
 
     Stores information about card sleeves including:
     - bundle: Unique identifier for the sleeve asset
+    - color statistics, see `ColoredAsset`
     - thumb: Thumbnail icon for the sleeve
     """
 
@@ -87,7 +107,7 @@ class CardModel(UnityAsset, base):
     __tablename__ = "card"
 
     # Original card name and description are kept separate from metadata so restoration is possible
-    name: Mapped[str] = mapped_column(String(255))
+    name: Mapped[str] = mapped_column(String(255), index=True)
     large_bundle: Mapped[str] = mapped_column(String(8), unique=True, nullable=True)
     medium_bundle: Mapped[str] = mapped_column(String(8), unique=True)
     small_bundle: Mapped[str] = mapped_column(String(8), unique=True)
@@ -95,13 +115,14 @@ class CardModel(UnityAsset, base):
     thumb: QIcon = QIcon()
 
 
-class FieldModel(UnityAsset, base):
+class FieldModel(UnityAsset, ColoredAsset, base):
     """
     Model for field assets.
 
     Stores information about field assets including:
     - bundle identifier
     - position flags (bottom, flipped)
+    - color statistics, see `ColoredAsset`
     - thumbnail icon
     """
 
@@ -112,4 +133,42 @@ class FieldModel(UnityAsset, base):
     thumb: QIcon = QIcon()
 
 
+class TextureHash(base):
+    """
+    Perceptual hashes of the textures in the game directory.
+
+    Stores one row per Texture2D, used for reverse image lookup:
+    - bundle and path_id locating the texture
+    - dhash and phash, 64 bit hashes stored as signed integers
+    - digest of the decoded pixels, to tell exact duplicates apart
+    - mtime of the bundle when it was hashed, to skip unchanged bundles
+    """
+
+    __tablename__ = "texture_hash"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    bundle: Mapped[str] = mapped_column(String(8), index=True)
+    path_id: Mapped[int] = mapped_column(BigInteger)
+    dhash: Mapped[int] = mapped_column(BigInteger)
+    phash: Mapped[int] = mapped_column(BigInteger)
+    digest: Mapped[str] = mapped_column(String(32), nullable=True)
+    mtime: Mapped[float] = mapped_column(Float)
+
+
+class IndexedBundle(base):
+    """
+    Bundles of the game directory visited by the texture indexer.
+
+    Stores one row per bundle, including the ones without any Texture2D or that could
+    not be loaded, so the indexer only opens them again once they change:
+    - bundle name
+    - mtime of the bundle when it was visited
+    """
+
+    __tablename__ = "indexed_bundle"
+
+    bundle: Mapped[str] = mapped_column(String(8), primary_key=True)
+    mtime: Mapped[float] = mapped_column(Float)
+
+
 base.metadata.create_all(engine)
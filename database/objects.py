@@ -1,19 +1,60 @@
 """
 Database configuration and session management.
-This module sets up SQLAlchemy with SQLite database and provides a global session object.
+This module sets up SQLAlchemy with SQLite database and provides a global session object,
+used by the GUI thread, along with per-thread sessions for background workers.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, declarative_base, scoped_session, sessionmaker
+
+# Seconds a connection waits for another one to release the write lock before failing
+BUSY_TIMEOUT: int = 30
 
 # Create declarative base for model classes
 base = declarative_base()
 
-# Create SQLite database engine
-engine = create_engine("sqlite:///database.db")
+# Create SQLite database engine, every thread checks out its own pooled connection
+engine = create_engine("sqlite:///database.db", connect_args={"timeout": BUSY_TIMEOUT})
+
+
+@event.listens_for(engine, "connect")
+def _configure_connection(dbapi_connection, _):
+    # WAL lets readers keep going while a background worker writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 
 # Create session factory
 DBsession = sessionmaker(bind=engine, autoflush=False)
 
+# Thread-local sessions, each worker thread gets its own session and connection
+worker_session = scoped_session(DBsession)
+
 # Create global session instance
 session = DBsession()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Unit of work for background threads, never share the global session with them.
+
+    The session of the calling thread is committed when the block exits, rolled back
+    if it raises, and removed either way.
+
+    :return: The session of the calling thread
+    """
+    db_session = worker_session()
+    try:
+        yield db_session
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        worker_session.remove()
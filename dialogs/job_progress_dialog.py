@@ -0,0 +1,59 @@
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QProgressDialog, QPushButton, QWidget
+
+from util.enums import JobStage
+from util.job_runner import Job, JobRunner
+
+# Milliseconds a job must run before the dialog shows up, so quick ones don't flash it
+SHOW_DELAY_MS: int = 400
+
+
+class JobProgressDialog(QProgressDialog):
+    """
+    Shows the stage of the job running on a page, without blocking it. The cancel button
+    is disabled once the job starts writing, as it can't be stopped anymore.
+    """
+
+    def __init__(self, runner: JobRunner, parent: QWidget):
+        super().__init__(parent)
+        self.runner = runner
+
+        self.setWindowTitle("Working")
+        self.setWindowModality(Qt.WindowModality.NonModal)
+        self.setRange(0, len(JobStage))
+        self.setMinimumDuration(SHOW_DELAY_MS)
+        self.setAutoReset(False)
+        self.setAutoClose(False)
+        self._cancel_button = QPushButton("Cancel")
+        self.setCancelButton(self._cancel_button)
+        # A progress dialog shows itself once created, it waits for the first job instead
+        self.reset()
+
+        self.canceled.disconnect(self.cancel)
+        self.canceled.connect(self._cancel)
+        runner.started.connect(self._on_started)
+        runner.stage_changed.connect(self._on_stage)
+        runner.ended.connect(self._on_ended)
+
+    def _on_started(self, job: Job):
+        self._cancel_button.setEnabled(True)
+        self._cancel_button.setText("Cancel")
+        self.setLabelText(job.title)
+        # Starts the delay after which the dialog shows up
+        self.setValue(0)
+
+    def _on_stage(self, job: Job, stage: JobStage, detail: str):
+        self.setLabelText(f"{job.title}\n{stage.value} {detail}".rstrip())
+        self.setValue(list(JobStage).index(stage))
+
+        if not job.cancellable:
+            self._cancel_button.setEnabled(False)
+
+    def _on_ended(self, _: Job):
+        self.reset()
+        self.hide()
+
+    def _cancel(self):
+        if self.runner.cancel():
+            self._cancel_button.setEnabled(False)
+            self._cancel_button.setText("Cancelling...")
@@ -2,42 +2,64 @@
 Main entry point for the Floowandereeze & Modding application.
 This module initializes the Qt application, sets up the UI theme,
 and handles the main application window and splash screen.
+
+Only Qt is imported up front, the database and the pages are imported once the splash
+screen is showing so it comes up as soon as possible.
 """
 
 import sys
 
+from util.startup_profiler import STARTUP_PROFILER
+
 from PySide6 import QtWidgets
 from PySide6.QtGui import QPixmap, QFont
 from PySide6.QtWidgets import QSplashScreen
 
-from database.objects import session
-from pages.main_window import MainWindow
-from util.ui_util import get_dark_mode_palette
-
 if __name__ == "__main__":
+    STARTUP_PROFILER.mark_since_start("imports")
+
     # Initialize the Qt application
-    app = QtWidgets.QApplication(sys.argv)
-    app.setPalette(get_dark_mode_palette(app))
+    with STARTUP_PROFILER.phase("QApplication"):
+        app = QtWidgets.QApplication(sys.argv)
+
+    # Create and show splash screen, its image is in the compiled resources
+    with STARTUP_PROFILER.phase("splash"):
+        from pages.ui import resources_rc  # pylint: disable=unused-import
 
-    try:
-        # Create and show splash screen
         splash_pixmap = QPixmap(":/ui/images/bg.png")
         splash = QSplashScreen(splash_pixmap)
         splash.setFont(QFont("Segoe UI", 14))
         splash.showMessage("Starting...", 4, "#FFFFFF")
         splash.show()
+        app.processEvents()
+
+    from util.ui_util import get_dark_mode_palette
+
+    app.setPalette(get_dark_mode_palette(app))
 
-        # Run database migrations
-        splash.showMessage("Updating database...", 4, "#FFFFFF")
+    # Run database migrations, done when the constants are first imported
+    splash.showMessage("Updating database...", 4, "#FFFFFF")
+    app.processEvents()
+    with STARTUP_PROFILER.phase("import database"):
+        from database.objects import session
+        import util.constants  # pylint: disable=unused-import
 
+    try:
         # Create and show main window
         splash.showMessage("Loading interface...", 4, "#FFFFFF")
-        window = MainWindow(splash)
-        window.setWindowTitle("Floowandereeze & Modding - Duel Links")
-        window.show()
+        app.processEvents()
+        with STARTUP_PROFILER.phase("import pages"):
+            from pages.main_window import MainWindow
+
+        with STARTUP_PROFILER.phase("MainWindow"):
+            window = MainWindow(splash)
+            window.setWindowTitle("Floowandereeze & Modding - Duel Links")
+            window.show()
 
         # Close splash screen when main window is ready
         splash.finish(window)
+        STARTUP_PROFILER.mark_since_start("startup")
+        STARTUP_PROFILER.write()
 
         # Start the application event loop
         app.exec()
@@ -51,3 +73,5 @@ if __name__ == "__main__":
     finally:
         # Always close the database session
         session.close()
+        # Pages built after startup are added to the trace on exit
+        STARTUP_PROFILER.write()
@@ -1,20 +1,33 @@
+from copy import copy
+from threading import Lock, Thread
+
 from typing_extensions import Optional
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QPixmap, QDragEnterEvent, QDropEvent
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import QFileDialog, QCompleter, QWidget, QCheckBox
 from pyqttoast import ToastPreset
 
 from database.models import CardModel
 from database.objects import session
 from dialogs.card_edit_dialog import CardEditDialog
+from dialogs.job_progress_dialog import JobProgressDialog
 from pages.models.card_list_model import CardListModel
+from pages.models.card_name_model import CardNameModel
 from pages.ui.card import Ui_Card
 from services.card_service import CardService
-from unity.unity_utils import fetch_bundle_thumb
+from services.search_service import CARD_NAME_INDEX
+from services.texture_index_service import find_matching_assets
+from unity.unity_utils import fetch_bundle_image, fetch_bundle_thumb
 from util.constants import IMAGE_FILTER, APP_CONFIG, CARD_ART_COORDINATES
-from util.enums import CardArtCoordinates
+from util.enums import CardArtCoordinates, JobStage
+from util.job_runner import JobRunner
+from util.preview_renderer import PreviewRenderer, render_card_preview, render_proxy
+from util.query_runner import QueryRunner
 from util.ui_util import show_toast
 
+# Milliseconds without typing before the search runs
+SEARCH_DEBOUNCE_MS: int = 250
+
 
 class Card(QWidget, Ui_Card):
     def __init__(self):
@@ -23,8 +36,28 @@ class Card(QWidget, Ui_Card):
 
         self.service = CardService()
         self.model = CardListModel()
+        self.names = CardNameModel()
+        # Builds the fuzzy search index before the first search needs it
+        Thread(target=CARD_NAME_INDEX.ensure_loaded, daemon=True).start()
         self.cardsView.setModel(self.model)
         self.selected: Optional[CardModel] = None
+        self.previewer = PreviewRenderer()
+        # Looks up the card matching a dropped image
+        self.lookup = QueryRunner()
+        # Card to select once the search started for it shows its results
+        self._pending_match: int | None = None
+        self.jobs = JobRunner()
+        self.job_progress = JobProgressDialog(self.jobs, self)
+        # Bundle and large texture of the last previewed card, used as the frame of the
+        # preview. Filled by the render worker, so only read or replaced under the lock
+        self._preview_frame: tuple[str, object] | None = None
+        self._preview_frame_lock = Lock()
+        # Bumped when the bundles change, a frame fetched before then is not kept
+        self._preview_frame_version = 0
+        # Searches once the user stops typing
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
 
         # Enable drag and drop
         self.setAcceptDrops(True)
@@ -33,6 +66,7 @@ class Card(QWidget, Ui_Card):
         self.model.search_description = False
 
         self._connect_callbacks()
+        self._restore_filters()
 
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         """Accepts drag and drop of image files."""
@@ -54,12 +88,60 @@ class Card(QWidget, Ui_Card):
             file_path = url.toLocalFile()
             if file_path.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".gif")):
                 self.cardEdit.setText(file_path)
-                self.preview.setPixmap(QPixmap(file_path))
                 self.service.image_path = file_path
+                self._update_preview()
+                self._look_up_image(file_path)
                 break
 
+    def _look_up_image(self, path: str):
+        """Looks for the card whose art matches the given image, in the background"""
+        self.lookup.request(
+            lambda _: [
+                (card.id, card.name)
+                for card in find_matching_assets(path, CardModel, 1)
+            ]
+        )
+
+    def _offer_match(self, matches: list[tuple[int, str]]):
+        if matches:
+            card_id, name = matches[0]
+            show_toast(
+                self,
+                "Lookup",
+                f"Image matches {name}, click to select it",
+                ToastPreset.INFORMATION_DARK,
+                lambda: self._select_match(card_id, name),
+            )
+
+    def _select_match(self, card_id: int, name: str):
+        row = self.model.find_card(card_id)
+        if row is not None:
+            self._select_row(row)
+            return
+
+        # The card is filtered out of the current results, so it is searched for and
+        # selected once the results show up
+        self._pending_match = card_id
+        self.searchEdit.setText(name)
+        self._search()
+
+    def _select_pending_match(self):
+        if self._pending_match is not None:
+            row = self.model.find_card(self._pending_match)
+            self._pending_match = None
+            if row is not None:
+                self._select_row(row)
+
+    def _select_row(self, row: int):
+        index = self.model.index(row)
+        self.cardsView.setCurrentIndex(index)
+        self.cardsView.scrollTo(index)
+        self._on_card_clicked(index)
+
     def _connect_callbacks(self):
         self.cardsView.clicked.connect(self._on_card_clicked)
+        self.lookup.ready.connect(self._offer_match)
+        self.model.modelReset.connect(self._select_pending_match)
         self.selectButton.clicked.connect(self._select_image)
         self.replaceButton.clicked.connect(self._replace)
         self.copyButton.clicked.connect(self._copy)
@@ -67,15 +149,47 @@ class Card(QWidget, Ui_Card):
         self.searchButton.clicked.connect(self._search)
         self.restoreButton.clicked.connect(self._restore)
         self.searchEdit.returnPressed.connect(self._search)
+        self._search_timer.timeout.connect(self._search_as_you_type)
         self.favorite.stateChanged.connect(self._toggle_favorite)
         self.favorites.stateChanged.connect(self._toggle_favorites_filter)
+        self.previewer.ready.connect(self.preview.setPixmap)
 
-        self.searchEdit.setCompleter(QCompleter(self.service.get_names()))
-        self.searchEdit.completer().setCaseSensitivity(
-            Qt.CaseSensitivity.CaseInsensitive
+        # The names are already filtered by the model, the completer only shows them
+        self.searchEdit.setCompleter(QCompleter(self.names, self))
+        self.searchEdit.completer().setCompletionMode(
+            QCompleter.CompletionMode.UnfilteredPopupCompletion
         )
-        self.searchEdit.completer().setFilterMode(Qt.MatchFlag.MatchContains)
         self.searchEdit.completer().activated.connect(self._search)
+        self.searchEdit.textEdited.connect(self._on_search_edited)
+        self.names.modelReset.connect(self._show_suggestions)
+
+    def _restore_filters(self):
+        """Shows the filters the model was restored with from the last session."""
+        self.searchEdit.setText(self.model.filter)
+        self.favorites.blockSignals(True)
+        self.favorites.setChecked(self.model.show_favorites)
+        self.favorites.blockSignals(False)
+
+    def _on_search_edited(self, text: str):
+        self.names.set_prefix(text)
+
+        # The results of the previous text are stale as soon as a key is typed
+        if not self.model.show_favorites:
+            self.model.cancel_search()
+            self._search_timer.start()
+
+    def _show_suggestions(self):
+        if self.names.rowCount() and self.searchEdit.hasFocus():
+            self.searchEdit.completer().complete()
+
+    def _search_as_you_type(self):
+        search_filter = self.searchEdit.text()
+
+        if search_filter.strip():
+            self.model.search(search_filter)
+        else:
+            # Cleared, the cards shown keep loading
+            self.model.resume_thumbnails()
 
     def _toggle_favorite(self, state):
         if self.selected and self.selected.favorite != (
@@ -93,26 +207,42 @@ class Card(QWidget, Ui_Card):
     def _toggle_favorites_filter(self, state):
         self.model.show_favorites = state == Qt.CheckState.Checked.value
         if self.model.show_favorites:
+            self._search_timer.stop()
             self.model.refresh()
-            self.model.layoutChanged.emit()
-        elif len(self.searchEdit.text()) >= 3:
+        elif self.searchEdit.text():
             self._search()
 
     def _toggle_description_search(self, state):
         self.model.search_description = state == Qt.CheckState.Checked.value
-        if len(self.searchEdit.text()) >= 3:
+        if self.searchEdit.text():
             self._search()
 
     def _restore(self):
-        if self.service.restore_asset():
-            self.model.refresh()
-            show_toast(
-                self, "Backup", "Card restored successfully", ToastPreset.SUCCESS_DARK
-            )
-        else:
-            show_toast(
-                self, "Backup", "Card backup not found", ToastPreset.WARNING_DARK
-            )
+        card, service = self.selected, copy(self.service)
+
+        def restored(found: bool):
+            if found:
+                self._modified(card, service)
+                show_toast(
+                    self,
+                    "Backup",
+                    "Card restored successfully",
+                    ToastPreset.SUCCESS_DARK,
+                )
+            else:
+                show_toast(
+                    self, "Backup", "Card backup not found", ToastPreset.WARNING_DARK
+                )
+
+        self.jobs.submit(
+            f"Restoring {card.name}",
+            lambda job: service.restore_asset(job=job),
+            restored,
+            lambda: show_toast(
+                self, "Backup", "Card restore cancelled", ToastPreset.INFORMATION_DARK
+            ),
+            self._show_job_error,
+        )
 
     def _on_card_clicked(self, index):
         self.selected = self.model.assets[index.row()]
@@ -137,6 +267,7 @@ class Card(QWidget, Ui_Card):
         self.restoreButton.setEnabled(True)
         self.copyButton.setEnabled(True)
         self.favorite.setChecked(self.selected.favorite)
+        self._update_preview()
 
     def _select_image(self):
         file, _ = QFileDialog.getOpenFileUrl(self, "Select Image", "", IMAGE_FILTER)
@@ -145,17 +276,22 @@ class Card(QWidget, Ui_Card):
             local_file = file.toLocalFile()
 
             self.cardEdit.setText(local_file)
-            self.preview.setPixmap(QPixmap(local_file))
             self.service.image_path = local_file
+            self._update_preview()
 
     def _copy(self):
         if not self.service.unity_file:
-            self.service.copy_bundle()
-            show_toast(
-                self,
-                "Card Copying",
-                'Card copied to the "cards" folder',
-                ToastPreset.SUCCESS_DARK,
+            service = copy(self.service)
+            self.jobs.submit(
+                f"Copying {service.bundle}",
+                service.copy_bundle,
+                lambda _: show_toast(
+                    self,
+                    "Card Copying",
+                    'Card copied to the "cards" folder',
+                    ToastPreset.SUCCESS_DARK,
+                ),
+                on_failed=self._show_job_error,
             )
         else:
             show_toast(
@@ -166,46 +302,120 @@ class Card(QWidget, Ui_Card):
             )
 
     def _extract_texture(self):
-        self.service.extract_texture(self.service.bundle)
-        show_toast(
-            self,
-            "Card Extraction",
-            'Card extracted to the "cards" folder',
-            ToastPreset.SUCCESS_DARK,
+        service = copy(self.service)
+        self.jobs.submit(
+            f"Extracting {service.bundle}",
+            lambda job: service.extract_texture(service.bundle, job=job),
+            lambda _: show_toast(
+                self,
+                "Card Extraction",
+                'Card extracted to the "cards" folder',
+                ToastPreset.SUCCESS_DARK,
+            ),
+            on_failed=self._show_job_error,
         )
 
     def _replace(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            self.service.create_backup(self.service.bundle)
-            self.model.set_backup_state(self.selected.id, True)
+        card, service = self.selected, copy(self.service)
+        backup = APP_CONFIG.create_backup and not card.has_backup
+        # Set by the job once the backup is written, even if it is cancelled afterward
+        backed_up = []
 
-        self.service.replace_bundle()
-        self.model.refresh()
-        self.current.setPixmap(
-            fetch_bundle_thumb(
-                self.service.bundle,
-                (374, 374),
-                self.service.unity_file,
-                CardArtCoordinates.LARGE.value,
-            ).pixmap(374, 374)
-        )
+        def replace(job):
+            # Checked again here, a replacement queued before this one may have
+            # made the backup already, and it must never be overwritten
+            if backup:
+                if not service.has_backup_file(service.bundle):
+                    job.stage(JobStage.LOADING, "backup")
+                    service.create_backup(service.bundle)
+                backed_up.append(True)
+            service.replace_bundle(job)
 
-        show_toast(
-            self, "Card", "Card replacement successful", ToastPreset.SUCCESS_DARK
-        )
+        def ended():
+            if backed_up:
+                self.model.set_backup_state(card.id, True)
+
+        def replaced(_):
+            ended()
+            self._modified(card, service)
+            show_toast(
+                self, "Card", "Card replacement successful", ToastPreset.SUCCESS_DARK
+            )
+
+        def cancelled():
+            ended()
+            show_toast(
+                self, "Card", "Card replacement cancelled", ToastPreset.INFORMATION_DARK
+            )
+
+        def failed(error: Exception):
+            ended()
+            self._show_job_error(error)
+
+        self.jobs.submit(f"Replacing {card.name}", replace, replaced, cancelled, failed)
+
+    def _modified(self, card: CardModel, service: CardService):
+        """Shows the new art of a card once its bundles were written."""
+        with self._preview_frame_lock:
+            self._preview_frame = None
+            self._preview_frame_version += 1
+        self.model.refresh_thumbnail(card)
+
+        if self.selected is card:
+            self.current.setPixmap(
+                fetch_bundle_thumb(
+                    service.bundle,
+                    (374, 374),
+                    service.unity_file,
+                    CardArtCoordinates.LARGE.value,
+                ).pixmap(374, 374)
+            )
+
+    def _show_job_error(self, error: Exception):
+        show_toast(self, "Card", f"Operation failed: {error}", ToastPreset.ERROR_DARK)
 
     def _search(self):
         search_filter = self.searchEdit.text()
+        self._search_timer.stop()
 
         if not self.model.show_favorites:
-            if len(search_filter) >= 3:
-                self.model.filter = search_filter
-                self.model.refresh()
-                self.model.layoutChanged.emit()
+            if search_filter.strip():
+                self.model.search(search_filter)
             else:
                 show_toast(
                     self,
                     "Search",
-                    "Please use 3 or more characters to search",
+                    "Please type something to search",
                     ToastPreset.INFORMATION_DARK,
                 )
+
+    def _update_preview(self):
+        """Renders the selected card with the chosen art pasted in the background"""
+        if not self.service.image_path:
+            return
+
+        path = self.service.image_path
+
+        if not self.selected:
+            self.previewer.request(lambda: render_proxy(path))
+            return
+
+        bundle = self.selected.large_bundle
+        unity_file = self.selected.unity_file
+
+        def render():
+            with self._preview_frame_lock:
+                cached, version = self._preview_frame, self._preview_frame_version
+
+            if cached is not None and cached[0] == bundle:
+                frame = cached[1]
+            else:
+                # Replaces the frame of the previous card, only one is ever kept
+                frame = fetch_bundle_image(bundle, unity_file)
+                with self._preview_frame_lock:
+                    if version == self._preview_frame_version:
+                        self._preview_frame = (bundle, frame)
+
+            return render_card_preview(path, frame)
+
+        self.previewer.request(render)
@@ -1,4 +1,5 @@
 from datetime import datetime
+import logging
 import os
 from threading import Thread
 
@@ -8,22 +9,32 @@ from PySide6.QtGui import QDragEnterEvent, QDropEvent
 from pyqttoast import ToastPreset
 
 from database.objects import session
-from database.models import CardModel
+from database.models import CardModel, FieldModel, SleeveModel
+from dialogs.job_progress_dialog import JobProgressDialog
 from dialogs.simple_dialogs import show_confirmation_dialog
-from pages.models.asset_list_model import AssetListModel
 from pages.ui.config import Ui_Config
 from services.card_service import CardService
+from services.duplicate_service import build_duplicate_report, write_duplicate_report
+from services.field_service import FieldService
+from services.sleeve_service import SleeveService
 from services.unity_service import UnityService
 from services.update_service import (
     update_sleeves,
     update_cards,
     update_fields,
-    get_github_raw_file,
+    get_remote_text,
 )
 from util.constants import APP_CONFIG, IMAGE_FILTER, BG_TEMPLATE
-from util.python_utils import get_instances_of_subclasses, is_valid_game_path
+from util.enums import JobStage
+from util.job_runner import Job, JobRunner
+from util.lazy_import import lazy_import
+from util.python_utils import is_valid_game_path
 from util.ui_util import show_toast
 
+requests = lazy_import("requests")
+
+logger = logging.getLogger(__name__)
+
 
 class Config(QWidget, Ui_Config):
     """
@@ -36,6 +47,8 @@ class Config(QWidget, Ui_Config):
     def __init__(self):
         super(Config, self).__init__()
         self.setupUi(self)
+        self.jobs = JobRunner()
+        self.job_progress = JobProgressDialog(self.jobs, self)
         self._connect_callbacks()
         self._set_variables()
         # Enable drag and drop
@@ -80,7 +93,7 @@ class Config(QWidget, Ui_Config):
     def restore_all_asset_changes(self) -> None:
         count = 0
 
-        for service, model in self._get_services_and_models():
+        for service, _ in self._get_services_and_models():
             backups_path = os.path.join("backups", service.subfolder)
 
             if os.path.exists(backups_path):
@@ -91,6 +104,7 @@ class Config(QWidget, Ui_Config):
                         service.bundle = filename.replace(".png", "")
                         count += 1 if service.restore_asset() else 0
 
+        for model in self._get_page_models():
             model.refresh()
 
         show_toast(
@@ -103,7 +117,7 @@ class Config(QWidget, Ui_Config):
     def delete_backups(self) -> None:
         count = 0
 
-        for service, model in self._get_services_and_models():
+        for service, db_model in self._get_services_and_models():
             backups_path = os.path.join("backups", service.subfolder)
 
             if os.path.exists(backups_path):
@@ -111,7 +125,10 @@ class Config(QWidget, Ui_Config):
                     os.remove(os.path.join(backups_path, filename))
                     count += 1
 
-            model.reset_backups()
+            session.query(db_model).update({"has_backup": False})
+
+        # Released right away, the background writers wait for the GUI session's lock
+        session.commit()
 
         show_toast(
             self,
@@ -120,12 +137,27 @@ class Config(QWidget, Ui_Config):
             ToastPreset.SUCCESS_DARK,
         )
 
-    def _get_services_and_models(self):
-        # This SHOULD return the correct service per model as long as the naming standard is followed
-        services: list[UnityService] = get_instances_of_subclasses(UnityService)
-        models: list[AssetListModel] = get_instances_of_subclasses(AssetListModel)
-
-        return zip(services, models)
+    def _get_services_and_models(self) -> list[tuple[UnityService, type]]:
+        return [
+            (CardService(), CardModel),
+            (SleeveService(), SleeveModel),
+            (FieldService(), FieldModel),
+        ]
+
+    def _get_page_models(self) -> list:
+        """
+        Returns the list models of the asset pages built so far, the ones built later
+        load their assets then.
+        """
+        stack = self.parentWidget()
+        if stack is None:
+            return []
+
+        return [
+            model
+            for index in range(stack.count())
+            if (model := getattr(stack.widget(index), "model", None)) is not None
+        ]
 
     def _connect_callbacks(self):
         self.gameButton.clicked.connect(self._get_game_path)
@@ -135,6 +167,7 @@ class Config(QWidget, Ui_Config):
         self.backupBox.clicked.connect(self._set_use_backups)
         self.restoreButton.clicked.connect(self._restore)
         self.clearButton.clicked.connect(self._delete_backups)
+        self.duplicatesButton.clicked.connect(self._find_duplicates)
         self.mipBox.textChanged.connect(self._set_mip_count)
         for radio in [
             self.noneButton,
@@ -198,6 +231,35 @@ class Config(QWidget, Ui_Config):
         ):
             self.restore_all_asset_changes()
 
+    def _find_duplicates(self):
+        def work(job: Job):
+            job.stage(JobStage.LOADING, "texture hashes")
+            report = build_duplicate_report()
+            job.stage(JobStage.WRITING, "report")
+            return report, write_duplicate_report(report)
+
+        def found(result):
+            report, path = result
+            show_toast(
+                self,
+                "Duplicates",
+                f'{len(report["exact"])} exact and {len(report["near"])} near duplicate '
+                f'groups found, report saved to "{path}"',
+                ToastPreset.SUCCESS_DARK,
+            )
+
+        self.jobs.submit(
+            "Finding duplicates",
+            work,
+            found,
+            on_failed=lambda error: show_toast(
+                self,
+                "Duplicates",
+                f"Duplicate search failed: {error}",
+                ToastPreset.ERROR_DARK,
+            ),
+        )
+
     def _set_use_backups(self):
         create_backup = self.backupBox.checkState() == Qt.CheckState.Checked
         APP_CONFIG.create_backup = create_backup
@@ -272,7 +334,17 @@ class Config(QWidget, Ui_Config):
             )
 
     def _get_data(self):
-        remote = get_github_raw_file("data/version.txt")
+        try:
+            remote = get_remote_text("data/version.txt")
+        except requests.RequestException:
+            show_toast(
+                self,
+                "Update",
+                "Could not reach the update server",
+                ToastPreset.ERROR_DARK,
+            )
+            return
+
         local = APP_CONFIG.version
 
         if (
@@ -289,10 +361,19 @@ class Config(QWidget, Ui_Config):
             )  # Remove cancel button since we can't cancel the update
             progress.show()
 
+            counts = []
+            errors = []
+
+            def run(update):
+                try:
+                    counts.append(update())
+                except Exception as e:
+                    logger.error(f"{update.__name__} failed: {e}")
+                    errors.append(e)
+
             update_threads = [
-                Thread(target=update_sleeves),
-                Thread(target=update_cards),
-                Thread(target=update_fields),
+                Thread(target=run, args=(update,))
+                for update in (update_sleeves, update_cards, update_fields)
             ]
 
             for thread in update_threads:
@@ -304,13 +385,32 @@ class Config(QWidget, Ui_Config):
 
             progress.close()
 
+            # The version is only bumped once every table is synced, so a failed
+            # update is retried next time instead of being reported as up to date
+            if errors:
+                show_toast(
+                    self,
+                    "Update",
+                    f"Data update failed: {errors[0]}",
+                    ToastPreset.ERROR_DARK,
+                )
+                return
+
             APP_CONFIG.version = remote
             session.commit()
 
             self.updateLine.setText(APP_CONFIG.version)
 
+            changes = {
+                name: sum(count[name] for count in counts)
+                for name in ("inserted", "updated", "deleted")
+            }
             show_toast(
-                self, "Update", "Data updated successfully", ToastPreset.SUCCESS_DARK
+                self,
+                "Update",
+                f"Data updated successfully ({changes['inserted']} added, "
+                f"{changes['updated']} changed, {changes['deleted']} removed)",
+                ToastPreset.SUCCESS_DARK,
             )
         else:
             show_toast(
@@ -1,13 +1,21 @@
+from copy import copy
+
 from PySide6 import QtWidgets
 from PySide6.QtGui import QPixmap, QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import QFileDialog
 from pyqttoast import ToastPreset
 
+from database.models import FieldModel
+from dialogs.job_progress_dialog import JobProgressDialog
 from pages.models.field_list_model import FieldListModel
 from pages.ui.field import Ui_Field
 from services.field_service import FieldService
+from services.texture_index_service import find_matching_assets
 from unity.unity_utils import fetch_field_thumb, fetch_bundle_thumb
 from util.constants import IMAGE_FILTER
+from util.enums import ColorFamily
+from util.job_runner import JobRunner
+from util.query_runner import QueryRunner
 from util.ui_util import show_toast
 
 
@@ -20,19 +28,51 @@ class Field(QtWidgets.QWidget, Ui_Field):
         self.model = FieldListModel()
         self.fieldsView.setModel(self.model)
         self.selected = None
+        # Looks up the field matching a dropped image
+        self.lookup = QueryRunner()
+        self.jobs = JobRunner()
+        self.job_progress = JobProgressDialog(self.jobs, self)
 
         # Enable drag and drop
         self.setAcceptDrops(True)
 
         self._connect_callbacks()
+        self._restore_filters()
 
     def _connect_callbacks(self):
         self.fieldsView.clicked.connect(self._on_field_clicked)
+        self.lookup.ready.connect(self._offer_match)
         self.selectButton.clicked.connect(self._select_image)
         self.replaceButton.clicked.connect(self._replace)
         self.extractButton.clicked.connect(self._extract_texture)
         self.copyButton.clicked.connect(self._copy)
 
+        self.colorBox.addItem("All Colors", None)
+        for family in ColorFamily:
+            self.colorBox.addItem(family.name.title(), family.value)
+        self.sortBox.addItem("Default Order", None)
+        self.sortBox.addItem("By Color", "color")
+        self.sortBox.addItem("By Brightness", "luminance")
+        self.colorBox.currentIndexChanged.connect(self._filter_color)
+        self.sortBox.currentIndexChanged.connect(self._filter_color)
+
+    def _restore_filters(self):
+        """Shows the filters the model was restored with from the last session."""
+        for box in (self.colorBox, self.sortBox):
+            box.blockSignals(True)
+        self.colorBox.setCurrentIndex(
+            max(self.colorBox.findData(self.model.color_family), 0)
+        )
+        self.sortBox.setCurrentIndex(max(self.sortBox.findData(self.model.sort), 0))
+        for box in (self.colorBox, self.sortBox):
+            box.blockSignals(False)
+
+    def _filter_color(self):
+        self.model.color_family = self.colorBox.currentData()
+        self.model.sort = self.sortBox.currentData()
+        self.model.refresh()
+        self.model.layoutChanged.emit()
+
     def _on_field_clicked(self, index):
         self.selected = self.model.fields[index.row()]
 
@@ -48,6 +88,34 @@ class Field(QtWidgets.QWidget, Ui_Field):
         self.extractButton.setEnabled(True)
         self.copyButton.setEnabled(True)
 
+    def _look_up_image(self, path: str):
+        """Looks for the field whose texture matches the given image, in the background"""
+        self.lookup.request(
+            lambda _: [field.id for field in find_matching_assets(path, FieldModel, 1)]
+        )
+
+    def _offer_match(self, matches: list[int]):
+        for field in self.model.fields:
+            if matches and field.id == matches[0]:
+                show_toast(
+                    self,
+                    "Lookup",
+                    f"Image matches field {field.medium_bundle}, click to select it",
+                    ToastPreset.INFORMATION_DARK,
+                    lambda: self._select_match(matches[0]),
+                )
+                break
+
+    def _select_match(self, field_id: int):
+        # Looked up again, the rows may have changed since the match was offered
+        for row, field in enumerate(self.model.fields):
+            if field.id == field_id:
+                index = self.model.index(row)
+                self.fieldsView.setCurrentIndex(index)
+                self.fieldsView.scrollTo(index)
+                self._on_field_clicked(index)
+                break
+
     def _select_image(self):
         file, _ = QFileDialog.getOpenFileUrl(self, "Select Image", "", IMAGE_FILTER)
 
@@ -59,35 +127,61 @@ class Field(QtWidgets.QWidget, Ui_Field):
             self.service.image_path = local_file
 
     def _extract_texture(self):
-        self.service.extract_texture(self.service.bundle)
-        show_toast(
-            self,
-            "Field Extraction",
-            'Field extracted to the "fields" folder',
-            ToastPreset.SUCCESS_DARK,
+        service = copy(self.service)
+        self.jobs.submit(
+            f"Extracting {service.bundle}",
+            lambda job: service.extract_texture(service.bundle, job=job),
+            lambda _: show_toast(
+                self,
+                "Field Extraction",
+                'Field extracted to the "fields" folder',
+                ToastPreset.SUCCESS_DARK,
+            ),
+            on_failed=self._show_job_error,
         )
 
     def _copy(self):
-        self.service.copy_bundle()
-        show_toast(
-            self,
-            "Field Copying",
-            'Field copied to the "fields" folder',
-            ToastPreset.SUCCESS_DARK,
+        service = copy(self.service)
+        self.jobs.submit(
+            f"Copying {service.bundle}",
+            service.copy_bundle,
+            lambda _: show_toast(
+                self,
+                "Field Copying",
+                'Field copied to the "fields" folder',
+                ToastPreset.SUCCESS_DARK,
+            ),
+            on_failed=self._show_job_error,
         )
 
     def _replace(self):
-        for bundle in [self.selected.small_bundle, self.selected.medium_bundle]:
-            self.service.bundle = bundle
-            self.service.replace_bundle()
-
-        self.model.refresh()
-        self.current.setPixmap(fetch_field_thumb(self.selected).pixmap(768, 267))
+        field, service = self.selected, copy(self.service)
+        bundles = [field.small_bundle, field.medium_bundle]
+
+        def replaced(_):
+            self.model.refresh_thumbnail(field)
+            if self.selected is field:
+                self.current.setPixmap(fetch_field_thumb(field).pixmap(768, 267))
+            show_toast(
+                self, "Field", "Field replacement successful", ToastPreset.SUCCESS_DARK
+            )
 
-        show_toast(
-            self, "Field", "Field replacement successful", ToastPreset.SUCCESS_DARK
+        self.jobs.submit(
+            f"Replacing {field.medium_bundle}",
+            lambda job: service.replace_bundles(bundles, job),
+            replaced,
+            lambda: show_toast(
+                self,
+                "Field",
+                "Field replacement cancelled",
+                ToastPreset.INFORMATION_DARK,
+            ),
+            self._show_job_error,
         )
 
+    def _show_job_error(self, error: Exception):
+        show_toast(self, "Field", f"Operation failed: {error}", ToastPreset.ERROR_DARK)
+
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         """Accepts drag and drop of image files."""
         if event.mimeData().hasUrls():
@@ -110,4 +204,5 @@ class Field(QtWidgets.QWidget, Ui_Field):
                 self.assetEdit.setText(file_path)
                 self.preview.setPixmap(QPixmap(file_path))
                 self.service.image_path = file_path
+                self._look_up_image(file_path)
                 break
@@ -4,6 +4,7 @@ This module provides the main application window that hosts all the different
 pages and handles navigation between them.
 """
 
+import logging
 import pathlib
 from typing import List, Type
 
@@ -16,10 +17,14 @@ from pages.config import Config
 from pages.field import Field
 from pages.sleeve import Sleeve
 from pages.ui.main_window import Ui_MainWindow
+from services.texture_index_service import start_texture_indexer
 from util.python_utils import is_valid_game_path
 from util.constants import APP_CONFIG, BG_TEMPLATE
+from util.startup_profiler import STARTUP_PROFILER
 from util.ui_util import show_toast
 
+logger = logging.getLogger(__name__)
+
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     """
@@ -30,11 +35,21 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     - Navigation between pages through the toolbar
     - Background image management
     - Game path validation and error handling
+    - Saving the list model snapshots on exit
 
     Attributes:
         splash: The splash screen widget used during application startup
+        LAZY_PAGES: Pages built on first navigation instead of on startup
+        WARM_UP_PAGES: Whether the pages not visited yet are built once the window is idle,
+            off as building a page decodes its thumbnails on the GUI thread, which freezes
+            the window for as long on a cold cache
+        WARM_UP_DELAY: Milliseconds to wait after startup before the warm-up
     """
 
+    LAZY_PAGES: List[Type[QtWidgets.QWidget]] = [Sleeve, Card, Field]
+    WARM_UP_PAGES: bool = False
+    WARM_UP_DELAY: int = 2000
+
     def __init__(self, splash: QSplashScreen):
         """
         Initialize the main window.
@@ -45,6 +60,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         super().__init__()
         self.splash = splash
         self.setupUi(self)
+        # Pages waiting to be built, by index in the main stack
+        self._pending_pages: dict[int, Type[QtWidgets.QWidget]] = {}
 
         self._load_pages()
         self._connect_menu_callbacks()
@@ -52,47 +69,40 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
         self.show()
 
+    def closeEvent(self, event) -> None:
+        """Saves the snapshot of the list models of the built pages before closing."""
+        for index in range(self.mainStack.count()):
+            model = getattr(self.mainStack.widget(index), "model", None)
+            if hasattr(model, "save_snapshot"):
+                try:
+                    model.save_snapshot()
+                except Exception as e:
+                    # A missing snapshot only costs a slower next start
+                    logger.warning(f"Could not save the snapshot of page {index}: {e}")
+
+        super().closeEvent(event)
+
     def _load_pages(self) -> None:
         """Loads the pages into the main stack based on the validity of the game path."""
         is_valid, error_message = is_valid_game_path(APP_CONFIG.game_path or "")
 
         if APP_CONFIG.game_path and is_valid:
-            pages: List[Type[QtWidgets.QWidget]] = [
-                Config,
-                Sleeve,
-                Card,
-                Field,
-            ]
-
             # Always load the Config page first
-            self.mainStack.addWidget(Config())
+            with STARTUP_PROFILER.phase("Config"):
+                self.mainStack.addWidget(Config())
 
-            # Try to load other pages, fallback to Config if they fail
-            for page in pages[1:]:  # Skip Config since it's already loaded
-                try:
-                    self.splash.showMessage(
-                        f"Loading {page.__name__}s...",
-                        alignment=QtCore.Qt.AlignBottom | QtCore.Qt.AlignCenter,
-                        color=QtCore.Qt.white,
-                    )
-                    self.mainStack.addWidget(page())
-                except Exception as e:
-                    show_toast(
-                        self,
-                        f"{page.__name__} Error",
-                        f"Failed to load {page.__name__} tab: {str(e)}",
-                        ToastPreset.WARNING_DARK,
-                    )
-                    # Add a placeholder widget that shows the error
-                    error_widget = QtWidgets.QWidget()
-                    layout = QtWidgets.QVBoxLayout()
-                    error_label = QtWidgets.QLabel(
-                        f"Failed to load {page.__name__} tab:\n{str(e)}"
-                    )
-                    error_label.setAlignment(QtCore.Qt.AlignCenter)
-                    layout.addWidget(error_label)
-                    error_widget.setLayout(layout)
-                    self.mainStack.addWidget(error_widget)
+            # The other pages are built on first navigation, an empty widget holds
+            # their place in the stack until then
+            for page in self.LAZY_PAGES:
+                self.mainStack.addWidget(QtWidgets.QWidget())
+                self._pending_pages[self.mainStack.count() - 1] = page
+
+            # Builds the remaining pages once the window had time to show up
+            if self.WARM_UP_PAGES:
+                QtCore.QTimer.singleShot(self.WARM_UP_DELAY, self._warm_up_pages)
+
+            # Keep the reverse image lookup index up to date in the background
+            start_texture_indexer()
         else:
             if error_message and APP_CONFIG.game_path:
                 show_toast(
@@ -101,7 +111,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                     f"There was a problem with the Game Path: {error_message}",
                     ToastPreset.WARNING_DARK,
                 )
-            self.mainStack.addWidget(Config())
+            with STARTUP_PROFILER.phase("Config"):
+                self.mainStack.addWidget(Config())
             self.toolBar.setEnabled(False)
 
     def _connect_menu_callbacks(self) -> None:
@@ -114,9 +125,65 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         ]
 
         for index, button in enumerate(buttons):
-            button.triggered.connect(
-                lambda _, idx=index: self.mainStack.setCurrentIndex(idx)
+            button.triggered.connect(lambda _, idx=index: self._show_page(idx))
+
+    def _show_page(self, index: int) -> None:
+        """
+        Shows the page at the given index of the stack, building it first if needed.
+
+        Args:
+            index: Index of the page in the main stack
+        """
+        self._build_page(index)
+        self.mainStack.setCurrentIndex(index)
+
+    def _build_page(self, index: int) -> None:
+        """
+        Builds a page that was not built yet and puts it in place of its placeholder.
+
+        Args:
+            index: Index of the page in the main stack
+        """
+        page = self._pending_pages.pop(index, None)
+
+        if page is None:
+            return
+
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            with STARTUP_PROFILER.phase(page.__name__):
+                widget = page()
+        except Exception as e:
+            show_toast(
+                self,
+                f"{page.__name__} Error",
+                f"Failed to load {page.__name__} tab: {str(e)}",
+                ToastPreset.WARNING_DARK,
+            )
+            # Add a placeholder widget that shows the error
+            widget = QtWidgets.QWidget()
+            layout = QtWidgets.QVBoxLayout()
+            error_label = QtWidgets.QLabel(
+                f"Failed to load {page.__name__} tab:\n{str(e)}"
             )
+            error_label.setAlignment(QtCore.Qt.AlignCenter)
+            layout.addWidget(error_label)
+            widget.setLayout(layout)
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+
+        placeholder = self.mainStack.widget(index)
+        self.mainStack.insertWidget(index, widget)
+        self.mainStack.removeWidget(placeholder)
+        placeholder.deleteLater()
+
+    def _warm_up_pages(self) -> None:
+        """Builds the pages not visited yet, one per event loop pass."""
+        if not self.WARM_UP_PAGES or not self._pending_pages:
+            return
+
+        self._build_page(min(self._pending_pages))
+        QtCore.QTimer.singleShot(0, self._warm_up_pages)
 
     def _load_bg(self) -> None:
         """Loads the background image based on the configuration."""
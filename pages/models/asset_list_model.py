@@ -1,11 +1,19 @@
 from abc import abstractmethod
+from threading import Thread
+from typing import Callable
 
-from PySide6 import QtCore
+import numpy as np
+from PIL import Image
+from PySide6 import QtCore, QtGui
+from sqlalchemy import update
 from sqlalchemy.orm import Mapped
 from typing_extensions import override
 
-from database.models import UnityAsset
+from database.models import ColoredAsset, UnityAsset
 from database.objects import session
+from services.snapshot_service import ModelSnapshot, bundle_mtime, encode_thumbnail
+from services.texture_index_service import digest_image
+from util.image_utils import color_statistics
 
 
 class AssetListModel(QtCore.QAbstractListModel):
@@ -24,10 +32,352 @@ class AssetListModel(QtCore.QAbstractListModel):
     def rowCount(self, index):
         return len(self.assets)
 
+    # Both commit right away, an uncommitted write of the GUI session holds the database
+    # write lock and blocks the background writers until it is committed
     def set_backup_state(self, asset_id: Mapped[int], has_backup: bool):
         session.query(self.db_model).filter(self.db_model.id == asset_id).update(
             {"has_backup": has_backup}
         )
+        session.commit()
 
     def reset_backups(self):
         session.query(self.db_model).update({"has_backup": False})
+        session.commit()
+
+
+# Statistics by digest of the thumbnail they were computed from, shared by the models so
+# a texture used by several assets is only analysed once
+_STATISTICS_BY_DIGEST: dict[str, tuple[str, int, float, bytes]] = {}
+
+# Columns of `ColoredAsset`, in the order of `color_statistics` then the digest
+COLOR_COLUMNS: tuple[str, ...] = (
+    "dominant_color",
+    "color_family",
+    "luminance",
+    "color_histogram",
+    "color_digest",
+)
+
+
+class ColorStatistics:
+    """
+    Color statistics of the assets of a model, computed from their thumbnails. They are
+    only computed when the digest of the thumbnail differs from the one they were
+    stored with.
+    """
+
+    def __init__(self, db_model: type[ColoredAsset]):
+        self.db_model = db_model
+        # Digest the stored statistics were computed from, by asset id
+        self._digests: dict[int, str | None] = {}
+        # Statistics and digest computed but not stored yet, by asset id
+        self._pending: dict[int, tuple] = {}
+
+    def track(self, assets: list[ColoredAsset]) -> None:
+        """
+        Reads the digests of the stored statistics, before the thumbnails are made.
+
+        :param assets: Assets of the model, read on the GUI thread
+        """
+        self._digests = {asset.id: asset.color_digest for asset in assets}
+
+    def measure(self, asset_id: int, img: Image.Image) -> None:
+        """
+        Computes the statistics of a thumbnail unless they are current, called by the
+        thumbnail workers.
+
+        :param asset_id: Id of the asset
+        :param img: Thumbnail of the asset
+        """
+        digest = digest_image(img)
+
+        if self._digests.get(asset_id) == digest:
+            return
+
+        if digest not in _STATISTICS_BY_DIGEST:
+            _STATISTICS_BY_DIGEST[digest] = color_statistics(img)
+
+        self._pending[asset_id] = (*_STATISTICS_BY_DIGEST[digest], digest)
+
+    def apply(self, assets: list[ColoredAsset]) -> None:
+        """
+        Stores the statistics computed for the given assets, on the GUI thread.
+
+        :param assets: Loaded assets of the model
+        """
+        # Workers may still be measuring other assets, only the given ones are taken
+        pending = {
+            asset.id: self._pending.pop(asset.id)
+            for asset in assets
+            if asset.id in self._pending
+        }
+
+        if not pending:
+            return
+
+        # Written through the GUI session, a second connection would wait for any write
+        # it still holds
+        session.execute(
+            update(self.db_model),
+            [
+                {"id": asset_id, **dict(zip(COLOR_COLUMNS, values))}
+                for asset_id, values in pending.items()
+            ],
+        )
+
+        # Committing expires the loaded assets, they read the new values when next used
+        session.commit()
+
+        for asset_id, values in pending.items():
+            self._digests[asset_id] = values[-1]
+
+
+class AssetIndex:
+    """
+    Compact in-memory index of the filterable columns of a list of assets, so switching
+    filters or sort order only picks other rows instead of querying the database again.
+    Missing colors and luminances sort first, as they do in SQLite.
+
+    Attributes:
+        assets: Every asset of the model, in id order
+    """
+
+    def __init__(self, assets: list[UnityAsset]):
+        self.assets = assets
+        self._positions = {asset.id: position for position, asset in enumerate(assets)}
+        self._favorite = np.zeros(len(assets), dtype=bool)
+        self._family = np.full(len(assets), -1, dtype=np.int16)
+        self._luminance = np.full(len(assets), -1.0, dtype=np.float32)
+
+        for position, asset in enumerate(assets):
+            self._store(position, asset)
+
+    def update(self, asset: UnityAsset) -> None:
+        """
+        Reads the filterable columns of an asset again, after it was changed.
+
+        :param asset: Asset of the index
+        """
+        if asset.id in self._positions:
+            self._store(self._positions[asset.id], asset)
+
+    def select(
+        self,
+        favorites: bool = False,
+        color_family: int | None = None,
+        sort: str | None = None,
+    ) -> list[UnityAsset]:
+        """
+        Picks the assets matching the given filters.
+
+        :param favorites: Whether only the favorite assets are kept
+        :param color_family: Value of the `ColorFamily` kept, all of them if None
+        :param sort: "color" to sort by color then luminance, "luminance" to sort by
+                     decreasing luminance, id order otherwise
+        :return: The matching assets, in order
+        """
+        mask = np.ones(len(self.assets), dtype=bool)
+
+        if favorites:
+            mask &= self._favorite
+        if color_family is not None:
+            mask &= self._family == color_family
+
+        positions = np.flatnonzero(mask)
+
+        if sort == "color":
+            positions = positions[
+                np.lexsort((self._luminance[positions], self._family[positions]))
+            ]
+        elif sort == "luminance":
+            positions = positions[
+                np.argsort(-self._luminance[positions], kind="stable")
+            ]
+
+        return [self.assets[position] for position in positions]
+
+    def _store(self, position: int, asset: UnityAsset) -> None:
+        self._favorite[position] = bool(asset.favorite)
+        if isinstance(asset, ColoredAsset):
+            if asset.color_family is not None:
+                self._family[position] = asset.color_family
+            if asset.luminance is not None:
+                self._luminance[position] = asset.luminance
+
+
+class _ThumbnailNotifier(QtCore.QObject):
+    """Hands the thumbnails made by background workers back to the GUI thread."""
+
+    ready = QtCore.Signal(object)
+
+
+class SnapshotMixin:
+    """
+    Warm start for the list models. The rows of the previous session keep the thumbnail
+    saved in their `ModelSnapshot`, decoded when the row is first painted, and only the
+    new rows are decoded from the bundles. The bundles of the restored thumbnails are
+    then checked in the background, and the thumbnails of the modified ones made again.
+
+    Models define `SNAPSHOT_NAME`, the attributes holding their filters in
+    `SNAPSHOT_STATE`, and `_snapshot_rows` returning their assets in display order.
+    Their thumbnail workers call `_remember_thumbnail` so the thumbnail is saved on exit.
+    """
+
+    SNAPSHOT_NAME: str
+    SNAPSHOT_STATE: tuple[str, ...] = ()
+
+    def _init_snapshot(self) -> None:
+        """Loads the snapshot and restores the filters it was saved with."""
+        self.snapshot = ModelSnapshot(self.SNAPSHOT_NAME)
+        self._warm_start = self.snapshot.load()
+        # Ids of the assets whose thumbnail comes from the snapshot, and not decoded yet
+        self._from_snapshot: set[int] = set()
+        self._undecoded: set[int] = set()
+        # Thumbnails made during this session: bundle, unity file, bundle mtime, data
+        self._encoded: dict[int, tuple[str, bool, int, bytes]] = {}
+        self._notifier = _ThumbnailNotifier()
+        self._notifier.ready.connect(self._on_thumbnail_remade)
+
+        if self._warm_start:
+            for attribute in self.SNAPSHOT_STATE:
+                if attribute in self.snapshot.state:
+                    setattr(self, attribute, self.snapshot.state[attribute])
+
+    @abstractmethod
+    def _snapshot_rows(self) -> list:
+        """Returns the assets of the model in display order, as saved in the snapshot."""
+
+    def _visible_rows(self) -> list:
+        return self.assets
+
+    def _thumbnails_to_make(self, assets: list, worker: Callable) -> list:
+        """
+        Picks the assets whose thumbnail must be made, on the first refresh after a warm
+        start the others are read from the snapshot and validated in the background.
+
+        :param assets: Assets of the refreshed model
+        :param worker: Thumbnail worker of the model, called with an asset and its bundle
+        :return: The assets whose thumbnail is missing
+        """
+        if not self._warm_start:
+            self._from_snapshot.difference_update(asset.id for asset in assets)
+            self._undecoded.difference_update(asset.id for asset in assets)
+            return assets
+
+        self._warm_start = False
+        missing = []
+
+        for asset in assets:
+            if self.snapshot.has(asset.id, asset.medium_bundle):
+                self._from_snapshot.add(asset.id)
+                self._undecoded.add(asset.id)
+                if self.snapshot.unity_file(asset.id):
+                    asset.unity_file = True
+            else:
+                missing.append(asset)
+
+        restored = [
+            (asset, asset.medium_bundle)
+            for asset in assets
+            if asset.id in self._from_snapshot
+        ]
+        Thread(
+            target=self._validate_snapshot, args=(restored, worker), daemon=True
+        ).start()
+
+        return missing
+
+    def _validate_snapshot(self, restored: list[tuple], worker: Callable) -> None:
+        stale = set(
+            self.snapshot.stale([(asset.id, bundle) for asset, bundle in restored])
+        )
+
+        for asset, bundle in restored:
+            if asset.id in stale:
+                self._undecoded.discard(asset.id)
+                worker(asset, bundle)
+                self._notifier.ready.emit(asset)
+
+    def _remake_thumbnail(self, asset, worker: Callable) -> None:
+        """
+        Makes the thumbnail of an asset again, after its bundle was modified.
+
+        :param asset: Asset of the model
+        :param worker: Thumbnail worker of the model, called with the asset and its bundle
+        """
+        self._undecoded.discard(asset.id)
+        worker(asset, asset.medium_bundle)
+        self._on_thumbnail_remade(asset)
+
+    def _on_thumbnail_remade(self, asset) -> None:
+        self._from_snapshot.discard(asset.id)
+        self._thumbnail_remade(asset)
+
+        row = self._row_of(asset)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def _row_of(self, asset) -> int | None:
+        """Returns the row showing an asset, None if it is filtered out."""
+        for row, shown in enumerate(self._visible_rows()):
+            if shown.id == asset.id:
+                return row
+
+        return None
+
+    def _thumbnail_remade(self, asset) -> None:
+        """Called on the GUI thread once the thumbnail of an asset was made again."""
+
+    def _snapshot_thumb(self, asset) -> QtGui.QIcon | None:
+        """
+        Returns the thumbnail of an asset, decoding it from the snapshot on first use.
+
+        :param asset: Asset of the model
+        """
+        if asset.id in self._undecoded:
+            self._undecoded.discard(asset.id)
+            asset.thumb = self.snapshot.thumb(asset.id)
+
+        return asset.thumb
+
+    def _remember_thumbnail(
+        self, asset_id: int, bundle: str, unity_file: bool, img: Image.Image | None
+    ) -> None:
+        """
+        Keeps a thumbnail made during this session to be saved in the snapshot.
+
+        :param asset_id: Id of the asset
+        :param bundle: Bundle the thumbnail was made from
+        :param unity_file: Whether the bundle is in the game install
+        :param img: Thumbnail, None if the bundle had no texture
+        """
+        self._encoded[asset_id] = (
+            bundle,
+            unity_file,
+            bundle_mtime(bundle, unity_file),
+            encode_thumbnail(img) if img is not None else b"",
+        )
+
+    def save_snapshot(self) -> None:
+        """Saves the filters, rows and thumbnails of the model, called on exit."""
+        rows = []
+
+        for asset in self._snapshot_rows():
+            if asset.id in self._from_snapshot:
+                rows.append(
+                    (
+                        asset.id,
+                        asset.medium_bundle,
+                        self.snapshot.unity_file(asset.id),
+                        self.snapshot.mtime(asset.id),
+                        self.snapshot.encoded(asset.id),
+                    )
+                )
+            elif asset.id in self._encoded:
+                rows.append((asset.id, *self._encoded[asset.id]))
+
+        self.snapshot.save(
+            {attribute: getattr(self, attribute) for attribute in self.SNAPSHOT_STATE},
+            rows,
+        )
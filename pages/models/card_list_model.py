@@ -1,69 +1,343 @@
+import logging
+from collections import OrderedDict
+from queue import Queue
 from textwrap import shorten
 from threading import Thread
 
 from PySide6.QtGui import Qt
+from PySide6 import QtCore
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
 from typing_extensions import override
-from sqlalchemy import or_
 
 from database.models import CardModel
 from database.objects import session
-from pages.models.asset_list_model import AssetListModel
-from unity.unity_utils import fetch_bundle_thumb
+from pages.models.asset_list_model import AssetListModel, SnapshotMixin
+from services.search_service import CARD_NAME_INDEX, card_match_ids
+from unity.unity_utils import fetch_bundle_image, image_to_icon
 from util.enums import CardArtCoordinates
+from util.query_runner import QueryRunner
+from util.startup_profiler import STARTUP_PROFILER
 
+logger = logging.getLogger(__name__)
 
-class CardListModel(AssetListModel):
+# Number of threads decoding the card thumbnails
+THUMBNAIL_WORKERS: int = 8
 
-    def __init__(self, cards=None):
+# Number of cards loaded at once, more are loaded as the grid is scrolled
+PAGE_SIZE: int = 128
+
+
+class CardListModel(AssetListModel, SnapshotMixin):
+    """
+    Card grid, showing the cards matching a search or the favorites. There are too many
+    cards to load them all, so the matching cards are loaded by pages in name order as
+    the grid is scrolled, each page starting after the last card shown (keyset
+    pagination). The thumbnails already made are kept and only the new cards are decoded.
+
+    Searches and pages are queried on a background thread and their thumbnails are queued
+    for a pool of workers, starting a new search cancels the running query and the queued
+    thumbnails.
+
+    Attributes:
+        cache_size: Number of card thumbnails kept for the next searches
+    """
+
+    SNAPSHOT_NAME = "cards"
+    SNAPSHOT_STATE = ("filter", "show_favorites")
+
+    def __init__(self, cards=None, cache_size: int = 2048):
         super().__init__(cards or [], CardModel)
         self.filter = ""
         self.show_favorites = False
         self.search_description = False
+        self.cache_size = cache_size
+        # Card id -> bundle, thumbnail and unity file, least recently shown first
+        self._thumb_cache: OrderedDict[int, tuple] = OrderedDict()
+        # Card id -> row, to repaint a card once its thumbnail is made
+        self._rows: dict[int, int] = {}
+        # Name and id of the last card shown, the next page starts after it
+        self._cursor: tuple[str, int] | None = None
+        self._exhausted = True
+        # Whether a search or a page is being queried
+        self._loading = False
+        # Bumped by every search, thumbnails queued for an older one are dropped
+        self._generation = 0
+        self._search = QueryRunner()
+        self._search.ready.connect(self._on_page)
+        self._search.failed.connect(self._on_page_failed)
+        # Generation, card and bundle of the thumbnails to make, in display order
+        self._jobs: Queue[tuple[int, CardModel, str]] = Queue()
+        self._workers: list[Thread] = []
+        # Ids of the shown cards whose thumbnail is still queued
+        self._pending: set[int] = set()
+        self._init_snapshot()
+
+        # The grid starts empty, unless the last session ended with a search shown
+        if self.filter or self.show_favorites:
+            self.refresh()
 
     @override
+    @STARTUP_PROFILER.profiled()
     def refresh(self):
-        query = session.query(self.db_model)
-
-        if self.filter != "" and not self.show_favorites:
-            if self.search_description:
-                # Search both name and description
-                query = query.filter(
-                    or_(
-                        self.db_model.name.contains(self.filter),
-                        self.db_model.large_bundle.contains(self.filter),
-                    )
-                )
-            else:
-                # Search only name
-                query = query.filter(self.db_model.name.contains(self.filter))
+        """Shows the first cards matching the filters right away, queuing their thumbnails."""
+        self.cancel_search()
+        self._show(self._generation, None, *self._page(session, self._filters(), None))
 
-        if self.show_favorites:
-            query = query.filter(self.db_model.favorite == True)
+    def search(self, search: str):
+        """
+        Searches the cards in the background, the rows are replaced once it is done.
+
+        :param search: Text typed by the user
+        """
+        self.filter = search
+        self.cancel_search()
+        self._request_page(None)
+
+    def cancel_search(self):
+        """
+        Drops the running search and the thumbnails queued for the shown cards, which
+        keep their rows until the next results come in.
+        """
+        self._generation += 1
+        self._search.cancel()
+        self._loading = False
+
+        # Queue has no public way to drop its items
+        with self._jobs.mutex:
+            self._jobs.queue.clear()
+
+    def resume_thumbnails(self):
+        """Queues again the thumbnails of the shown cards dropped by `cancel_search`."""
+        self._queue_thumbnails(
+            [card for card in self.assets if card.id in self._pending]
+        )
+
+    def find_card(self, card_id: int) -> int | None:
+        """
+        Finds the row of a card.
 
-        self.assets = query.order_by(self.db_model.name).all()
+        :param card_id: Id of the card
+        :return: The row of the card, None if it isn't loaded
+        """
+        return self._rows.get(card_id)
 
-        refresh_threads = [
-            Thread(target=lambda card=cards_card: self._refresh_card(card))
-            for cards_card in self.assets
-        ]
+    @override
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    @override
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if self.canFetchMore(parent):
+            self._request_page(self._cursor)
 
-        for thread in refresh_threads:
-            thread.start()
-        for thread in refresh_threads:
-            thread.join()
+    def _filters(self) -> tuple[str, bool, bool]:
+        return self.filter, self.show_favorites, self.search_description
 
-    def _refresh_card(self, card):
-        card.thumb = fetch_bundle_thumb(
-            card.medium_bundle,
-            (128, 128),
-            crop_coordinates=CardArtCoordinates.MEDIUM.value,
+    def _request_page(self, after: tuple[str, int] | None):
+        generation, filters = self._generation, self._filters()
+        self._loading = True
+        self._search.request(
+            lambda db_session: (
+                generation,
+                after,
+                *self._page(db_session, filters, after),
+            )
         )
-        if not card.thumb:
-            card.thumb = fetch_bundle_thumb(
-                card.medium_bundle, (128, 128), True, CardArtCoordinates.MEDIUM.value
+
+    def _on_page(self, page: tuple):
+        if page[0] == self._generation:
+            self._loading = False
+            self._show(*page)
+
+    def _on_page_failed(self, _: Exception):
+        # Scrolling asks for the page again
+        self._loading = False
+
+    def _page(
+        self,
+        db_session: Session,
+        filters: tuple[str, bool, bool],
+        after: tuple[str, int] | None,
+    ) -> tuple[list[int], bool]:
+        """
+        Queries the ids of the next cards matching the given filters.
+
+        :param db_session: Session of the calling thread
+        :param filters: Search, whether only the favorites are shown, and whether the
+                        bundles are searched along with the name
+        :param after: Name and id of the last card shown, None for the first page
+        :return: Ids of the cards, and whether there are no more of them
+        """
+        search, show_favorites, description = filters
+        query = select(self.db_model.id)
+        matches = None
+
+        if show_favorites:
+            query = query.filter(self.db_model.favorite == True)
+        elif search != "":
+            # Searches the name, and the bundles too when searching by description
+            matches = card_match_ids(search, description)
+            if matches is not None:
+                query = query.filter(self.db_model.id.in_(matches))
+            else:
+                # No word to match, like "!!", so the text is looked up as typed
+                query = query.filter(self.db_model.name.contains(search))
+
+        if after is not None:
+            query = query.filter(tuple_(self.db_model.name, self.db_model.id) > after)
+
+        ids = list(
+            db_session.scalars(
+                query.order_by(self.db_model.name, self.db_model.id).limit(PAGE_SIZE)
             )
+        )
+
+        if after is None and search != "" and not show_favorites and not ids:
+            # Nothing matches as typed, so look for names that are close enough
+            return [card_id for card_id, _ in CARD_NAME_INDEX.search(search)], True
+
+        return ids, len(ids) < PAGE_SIZE
+
+    def _show(
+        self,
+        generation: int,
+        after: tuple[str, int] | None,
+        ids: list[int],
+        exhausted: bool,
+    ):
+        """
+        Shows the given cards, loaded from the GUI session.
+
+        :param generation: Search the cards were queried for
+        :param after: Name and id of the card the page starts after, None to replace the
+                      rows
+        :param ids: Ids of the cards, in display order
+        :param exhausted: Whether there are no more cards to load
+        """
+        cards = {
+            card.id: card
+            for card in session.query(self.db_model).filter(self.db_model.id.in_(ids))
+        }
+        page = [cards[card_id] for card_id in ids if card_id in cards]
+
+        if after is not None and not page:
+            self._exhausted = True
+            return
+
+        missing = self._thumbnails_to_make(
+            [card for card in page if not self._reuse_thumbnail(card)],
+            self._refresh_card,
+        )
+        for card in missing:
+            card.thumb = None
+
+        if after is None:
+            self.beginResetModel()
+            self.assets = page
+            self._rows = {card.id: row for row, card in enumerate(page)}
+            self._pending = {card.id for card in missing}
+        else:
+            first = len(self.assets)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(page) - 1)
+            self.assets.extend(page)
+            self._rows.update((card.id, first + row) for row, card in enumerate(page))
+            self._pending.update(card.id for card in missing)
+
+        self._cursor = (page[-1].name, page[-1].id) if page else after
+        self._exhausted = exhausted
+
+        if after is None:
+            self.endResetModel()
+        else:
+            self.endInsertRows()
+
+        self._queue_thumbnails(missing, generation)
+
+    def _queue_thumbnails(self, cards: list[CardModel], generation: int | None = None):
+        generation = self._generation if generation is None else generation
+
+        while len(self._workers) < min(THUMBNAIL_WORKERS, len(cards)):
+            worker = Thread(target=self._make_thumbnails, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        # The bundle is read on the GUI thread, so workers never trigger a lazy load
+        # through the shared session
+        for card in cards:
+            self._jobs.put((generation, card, card.medium_bundle))
+
+    def _make_thumbnails(self):
+        while True:
+            generation, card, bundle = self._jobs.get()
+
+            if generation != self._generation:
+                continue
+
+            try:
+                self._refresh_card(card, bundle)
+            except Exception as e:
+                # A broken bundle only leaves its card without a thumbnail
+                logger.warning(f"Could not make the thumbnail of {bundle}: {e}")
+                card.thumb = None
+
+            self._notifier.ready.emit(card)
+
+    def refresh_thumbnail(self, card: CardModel):
+        """Makes the thumbnail of a modified card again, only repainting its row."""
+        self._remake_thumbnail(card, self._refresh_card)
+
+    def _reuse_thumbnail(self, card: CardModel) -> bool:
+        cached = self._thumb_cache.get(card.id)
+
+        if cached is not None and cached[0] == card.medium_bundle:
+            self._thumb_cache.move_to_end(card.id)
+            _, card.thumb, card.unity_file = cached
+            return True
+
+        # Still valid in the snapshot, decoded again when painted
+        if card.id in self._from_snapshot:
+            self._undecoded.add(card.id)
+            card.unity_file = self.snapshot.unity_file(card.id)
+            return True
+
+        return False
+
+    def _cache_thumbnail(self, card: CardModel):
+        self._thumb_cache[card.id] = (card.medium_bundle, card.thumb, card.unity_file)
+        self._thumb_cache.move_to_end(card.id)
+
+        while len(self._thumb_cache) > self.cache_size:
+            card_id, _ = self._thumb_cache.popitem(last=False)
+            self._encoded.pop(card_id, None)
+
+    def _thumbnail_remade(self, card):
+        self._pending.discard(card.id)
+        self._cache_thumbnail(card)
+
+    def _row_of(self, card):
+        row = self._rows.get(card.id)
+        return row if row is not None and self.assets[row] is card else None
+
+    def _refresh_card(self, card, bundle):
+        unity_file = False
+        img = fetch_bundle_image(bundle)
+        if img is None:
+            unity_file = True
+            img = fetch_bundle_image(bundle, unity_file)
             card.unity_file = True
 
+        if img is not None:
+            img = img.crop(CardArtCoordinates.MEDIUM.value).resize((128, 128))
+            card.thumb = image_to_icon(img)
+        else:
+            card.thumb = None
+
+        self._remember_thumbnail(card.id, bundle, unity_file, img)
+
+    def _snapshot_rows(self):
+        return self.assets
+
     def data(self, index, role):
         if role == Qt.DisplayRole:
             return shorten(
@@ -74,4 +348,4 @@ class CardListModel(AssetListModel):
             )
 
         if role == Qt.DecorationRole:
-            return self.assets[index.row()].thumb
+            return self._snapshot_thumb(self.assets[index.row()])
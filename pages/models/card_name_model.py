@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing_extensions import override
+
+from database.models import CardModel
+from services.search_service import CARD_NAME_INDEX, card_matches
+from util.query_runner import QueryRunner
+
+
+class CardNameModel(QAbstractListModel):
+    """
+    Completion model for the card search box, holding only the names matching the text
+    being typed. Names are queried from the search index on demand, capped, and cached
+    per prefix, so nothing is loaded up front. Prefixes matching most of the cards are
+    slow to rank, so the names are queried in the background and the model is reset once
+    they arrive.
+
+    Attributes:
+        limit: Maximum number of suggested names
+        cache_size: Number of prefixes whose suggestions are kept
+    """
+
+    def __init__(self, limit: int = 50, cache_size: int = 128):
+        super().__init__()
+        self.limit = limit
+        self.cache_size = cache_size
+        self.names: list[str] = []
+        self._cache: OrderedDict[tuple[int, str], list[str]] = OrderedDict()
+        self._query = QueryRunner()
+        self._query.ready.connect(self._on_suggestions)
+
+    def set_prefix(self, prefix: str) -> None:
+        """
+        Replaces the suggestions with the names matching the given text, right away if
+        they are cached and once they are queried otherwise.
+
+        :param prefix: Text typed in the search box
+        """
+        prefix = prefix.strip()
+
+        if not prefix:
+            self._query.cancel()
+            self._set_names([])
+            return
+
+        # The generation changes whenever an update changes the card names
+        key = (CARD_NAME_INDEX.generation, prefix.lower())
+
+        if key in self._cache:
+            self._query.cancel()
+            self._cache.move_to_end(key)
+            self._set_names(self._cache[key])
+        else:
+            self._query.request(
+                lambda db_session: (key, self._suggestions(db_session, prefix))
+            )
+
+    def _on_suggestions(self, result: tuple[tuple[int, str], list[str]]) -> None:
+        key, names = result
+
+        self._cache[key] = names
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        self._set_names(names)
+
+    def _set_names(self, names: list[str]) -> None:
+        self.beginResetModel()
+        self.names = names
+        self.endResetModel()
+
+    def _suggestions(self, db_session: Session, prefix: str) -> list[str]:
+        matches = card_matches(prefix)
+
+        if matches is not None:
+            matches = matches.subquery()
+            query = (
+                select(CardModel.name)
+                .join(matches, matches.c.rowid == CardModel.id)
+                .order_by(matches.c.rank, CardModel.name)
+            )
+        else:
+            query = (
+                select(CardModel.name)
+                .where(CardModel.name.contains(prefix))
+                .order_by(CardModel.name)
+            )
+
+        # Alts share their name, so a few more rows are read than names suggested
+        rows = db_session.scalars(query.limit(self.limit * 4))
+        return list(dict.fromkeys(rows))[: self.limit]
+
+    @override
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.names)
+
+    @override
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.names[index.row()]
@@ -5,23 +5,43 @@ from PySide6.QtGui import Qt
 
 from database.models import FieldModel
 from database.objects import session
-from unity.unity_utils import fetch_field_thumb, fetch_bundle_thumb
+from pages.models.asset_list_model import (
+    AssetIndex,
+    ColorStatistics,
+    SnapshotMixin,
+)
+from unity.unity_utils import fetch_bundle_image, image_to_icon
+from util.startup_profiler import STARTUP_PROFILER
 
 
-class FieldListModel(QtCore.QAbstractListModel):
+class FieldListModel(QtCore.QAbstractListModel, SnapshotMixin):
+
+    SNAPSHOT_NAME = "fields"
+    SNAPSHOT_STATE = ("color_family", "sort")
 
     def __init__(self, fields=None):
         super().__init__()
         self.fields: list[FieldModel] = fields or []
         self.thumbs = None
-        self.refresh()
+        self.color_family: int | None = None
+        self.sort: str | None = None
+        self.colors = ColorStatistics(FieldModel)
+        self._index = AssetIndex([])
+        self._init_snapshot()
+        self.reload()
 
-    def refresh(self):
-        self.fields = session.query(FieldModel).all()
+    @STARTUP_PROFILER.profiled()
+    def reload(self):
+        """Loads every field and its thumbnail, the filters then pick among them."""
+        fields = session.query(FieldModel).order_by(FieldModel.id).all()
+        self.colors.track(fields)
 
         refresh_threads = [
-            Thread(target=lambda field=fields_field: self.refresh_field(field))
-            for fields_field in self.fields
+            Thread(
+                target=self.refresh_field,
+                args=(fields_field, fields_field.medium_bundle),
+            )
+            for fields_field in self._thumbnails_to_make(fields, self.refresh_field)
         ]
 
         for thread in refresh_threads:
@@ -29,15 +49,49 @@ class FieldListModel(QtCore.QAbstractListModel):
         for thread in refresh_threads:
             thread.join()
 
-    def refresh_field(self, field):
-        field.thumb = fetch_bundle_thumb(field.medium_bundle, (256, 128))
+        self.colors.apply(fields)
+
+        self._index = AssetIndex(fields)
+        self.refresh()
+
+    @STARTUP_PROFILER.profiled()
+    def refresh(self):
+        """Shows the loaded fields matching the filters, without querying them again."""
+        self.fields = self._index.select(False, self.color_family, self.sort)
+
+    def refresh_thumbnail(self, field: FieldModel):
+        """Makes the thumbnail of a modified field again, only repainting its row."""
+        self._remake_thumbnail(field, self.refresh_field)
+
+    def refresh_field(self, field, bundle):
+        img = fetch_bundle_image(bundle)
+
+        if img is None:
+            field.thumb = None
+            self._remember_thumbnail(field.id, bundle, False, None)
+            return
+
+        img = img.resize((256, 128))
+        self.colors.measure(field.id, img)
+        field.thumb = image_to_icon(img)
+        self._remember_thumbnail(field.id, bundle, False, img)
+
+    def _snapshot_rows(self):
+        return self._index.assets
+
+    def _visible_rows(self):
+        return self.fields
+
+    def _thumbnail_remade(self, field):
+        self.colors.apply([field])
+        self._index.update(field)
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
             return ""
 
         if role == Qt.DecorationRole:
-            return self.fields[index.row()].thumb
+            return self._snapshot_thumb(self.fields[index.row()])
 
     def rowCount(self, index):
         return len(self.fields)
@@ -5,29 +5,43 @@ from PySide6.QtCore import Qt
 
 from database.models import SleeveModel
 from database.objects import session
-from pages.models.asset_list_model import AssetListModel
-from unity.unity_utils import fetch_bundle_thumb
+from pages.models.asset_list_model import (
+    AssetIndex,
+    AssetListModel,
+    ColorStatistics,
+    SnapshotMixin,
+)
+from unity.unity_utils import fetch_bundle_image, image_to_icon
+from util.startup_profiler import STARTUP_PROFILER
 
 
-class SleeveListModel(AssetListModel):
+class SleeveListModel(AssetListModel, SnapshotMixin):
+
+    SNAPSHOT_NAME = "sleeves"
+    SNAPSHOT_STATE = ("show_favorites", "color_family", "sort")
 
     def __init__(self, sleeves=None):
         super().__init__(sleeves or [], SleeveModel)
         self.show_favorites = False
-        self.refresh()
+        self.color_family: int | None = None
+        self.sort: str | None = None
+        self.colors = ColorStatistics(SleeveModel)
+        self._index = AssetIndex([])
+        self._init_snapshot()
+        self.reload()
 
-    @override
-    def refresh(self):
-        if self.show_favorites:
-            self.assets = (
-                session.query(SleeveModel).filter(SleeveModel.favorite == True).all()
-            )
-        else:
-            self.assets = session.query(SleeveModel).all()
+    @STARTUP_PROFILER.profiled()
+    def reload(self):
+        """Loads every sleeve and its thumbnail, the filters then pick among them."""
+        sleeves = session.query(SleeveModel).order_by(SleeveModel.id).all()
+        self.colors.track(sleeves)
 
         refresh_threads = [
-            Thread(target=lambda sleeve=sleeves_sleeve: self.refresh_sleeve(sleeve))
-            for sleeves_sleeve in self.assets
+            Thread(
+                target=self.refresh_sleeve,
+                args=(sleeves_sleeve, sleeves_sleeve.medium_bundle),
+            )
+            for sleeves_sleeve in self._thumbnails_to_make(sleeves, self.refresh_sleeve)
         ]
 
         for thread in refresh_threads:
@@ -35,12 +49,52 @@ class SleeveListModel(AssetListModel):
         for thread in refresh_threads:
             thread.join()
 
-    def refresh_sleeve(self, sleeve):
-        sleeve.thumb = fetch_bundle_thumb(sleeve.medium_bundle, (128, 181))
+        self.colors.apply(sleeves)
+
+        self._index = AssetIndex(sleeves)
+        self.refresh()
+
+    @override
+    @STARTUP_PROFILER.profiled()
+    def refresh(self):
+        """Shows the loaded sleeves matching the filters, without querying them again."""
+        self.assets = self._index.select(
+            self.show_favorites, self.color_family, self.sort
+        )
+
+    def set_favorite(self, sleeve: SleeveModel, favorite: bool):
+        """Marks a sleeve as favorite or not, the favorites filter sees it right away."""
+        sleeve.favorite = favorite
+        session.commit()
+        self._index.update(sleeve)
+
+    def refresh_thumbnail(self, sleeve: SleeveModel):
+        """Makes the thumbnail of a modified sleeve again, only repainting its row."""
+        self._remake_thumbnail(sleeve, self.refresh_sleeve)
+
+    def refresh_sleeve(self, sleeve, bundle):
+        img = fetch_bundle_image(bundle)
+
+        if img is None:
+            sleeve.thumb = None
+            self._remember_thumbnail(sleeve.id, bundle, False, None)
+            return
+
+        img = img.resize((128, 181))
+        self.colors.measure(sleeve.id, img)
+        sleeve.thumb = image_to_icon(img)
+        self._remember_thumbnail(sleeve.id, bundle, False, img)
+
+    def _snapshot_rows(self):
+        return self._index.assets
+
+    def _thumbnail_remade(self, sleeve):
+        self.colors.apply([sleeve])
+        self._index.update(sleeve)
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
             return ""
 
         if role == Qt.DecorationRole:
-            return self.assets[index.row()].thumb
+            return self._snapshot_thumb(self.assets[index.row()])
@@ -1,15 +1,23 @@
+from copy import copy
+
 from PySide6 import QtWidgets, QtCore
-from PySide6.QtGui import QPixmap, QDragEnterEvent, QDropEvent
+from PySide6.QtGui import QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import QFileDialog
 from pyqttoast import ToastPreset
 
-from database.objects import session
+from database.models import SleeveModel
+from dialogs.job_progress_dialog import JobProgressDialog
 from dialogs.simple_dialogs import show_color_dialog
 from pages.models.sleeve_list_model import SleeveListModel
 from pages.ui.sleeve import Ui_Sleeve
 from services.sleeve_service import SleeveService
+from services.texture_index_service import find_matching_assets
 from unity.unity_utils import fetch_bundle_thumb
 from util.constants import IMAGE_FILTER, APP_CONFIG
+from util.enums import ColorFamily, JobStage
+from util.job_runner import JobRunner
+from util.preview_renderer import PreviewRenderer, render_sleeve_preview
+from util.query_runner import QueryRunner
 from util.ui_util import show_toast
 
 
@@ -22,11 +30,17 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         self.model = SleeveListModel()
         self.sleevesView.setModel(self.model)
         self.selected = None
+        self.previewer = PreviewRenderer()
+        # Looks up the sleeve matching a dropped image
+        self.lookup = QueryRunner()
+        self.jobs = JobRunner()
+        self.job_progress = JobProgressDialog(self.jobs, self)
 
         # Enable drag and drop
         self.setAcceptDrops(True)
 
         self._connect_callbacks()
+        self._restore_filters()
 
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         """Accepts drag and drop of image files."""
@@ -48,23 +62,74 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
             file_path = url.toLocalFile()
             if file_path.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".gif")):
                 self.sleeveEdit.setText(file_path)
-                self.preview.setPixmap(QPixmap(file_path))
                 self.service.image_path = file_path
+                self._update_preview()
+                self._look_up_image(file_path)
+                break
+
+    def _look_up_image(self, path: str):
+        """Looks for the sleeve whose texture matches the given image, in the background"""
+        self.lookup.request(
+            lambda _: [
+                sleeve.id for sleeve in find_matching_assets(path, SleeveModel, 1)
+            ]
+        )
+
+    def _offer_match(self, matches: list[int]):
+        for sleeve in self.model.assets:
+            if matches and sleeve.id == matches[0]:
+                show_toast(
+                    self,
+                    "Lookup",
+                    f"Image matches sleeve {sleeve.medium_bundle}, click to select it",
+                    ToastPreset.INFORMATION_DARK,
+                    lambda: self._select_match(matches[0]),
+                )
+                break
+
+    def _select_match(self, sleeve_id: int):
+        # Looked up again, the rows may have changed since the match was offered
+        for row, sleeve in enumerate(self.model.assets):
+            if sleeve.id == sleeve_id:
+                index = self.model.index(row)
+                self.sleevesView.setCurrentIndex(index)
+                self.sleevesView.scrollTo(index)
+                self._on_sleeve_clicked(index)
                 break
 
     def _restore(self):
-        if self.service.restore_asset():
-            self.model.refresh()
-            show_toast(
-                self, "Backup", "Sleeve restored successfully", ToastPreset.SUCCESS_DARK
-            )
-        else:
-            show_toast(
-                self, "Backup", "Sleeve backup not found", ToastPreset.WARNING_DARK
-            )
+        sleeve, service = self.selected, copy(self.service)
+
+        def restored(found: bool):
+            if found:
+                self.model.refresh_thumbnail(sleeve)
+                show_toast(
+                    self,
+                    "Backup",
+                    "Sleeve restored successfully",
+                    ToastPreset.SUCCESS_DARK,
+                )
+            else:
+                show_toast(
+                    self, "Backup", "Sleeve backup not found", ToastPreset.WARNING_DARK
+                )
+
+        self.jobs.submit(
+            f"Restoring {service.bundle}",
+            lambda job: service.restore_asset(job=job),
+            restored,
+            lambda: show_toast(
+                self,
+                "Backup",
+                "Sleeve restore cancelled",
+                ToastPreset.INFORMATION_DARK,
+            ),
+            self._show_job_error,
+        )
 
     def _connect_callbacks(self):
         self.sleevesView.clicked.connect(self._on_sleeve_clicked)
+        self.lookup.ready.connect(self._offer_match)
         self.selectButton.clicked.connect(self._select_image)
         self.replaceButton.clicked.connect(self._replace_sleeve)
         self.copyButton.clicked.connect(self._copy)
@@ -75,13 +140,36 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         self.fadeCheckBox.clicked.connect(self._toggle_fade)
         self.favoriteBox.stateChanged.connect(self._toggle_favorite)
         self.favoritesBox.stateChanged.connect(self._toggle_favorites_filter)
+        self.previewer.ready.connect(self.preview.setPixmap)
+
+        self.colorBox.addItem("All Colors", None)
+        for family in ColorFamily:
+            self.colorBox.addItem(family.name.title(), family.value)
+        self.sortBox.addItem("Default Order", None)
+        self.sortBox.addItem("By Color", "color")
+        self.sortBox.addItem("By Brightness", "luminance")
+        self.colorBox.currentIndexChanged.connect(self._filter_color)
+        self.sortBox.currentIndexChanged.connect(self._filter_color)
+
+    def _restore_filters(self):
+        """Shows the filters the model was restored with from the last session."""
+        for box in (self.favoritesBox, self.colorBox, self.sortBox):
+            box.blockSignals(True)
+        self.favoritesBox.setChecked(self.model.show_favorites)
+        self.colorBox.setCurrentIndex(
+            max(self.colorBox.findData(self.model.color_family), 0)
+        )
+        self.sortBox.setCurrentIndex(max(self.sortBox.findData(self.model.sort), 0))
+        for box in (self.favoritesBox, self.colorBox, self.sortBox):
+            box.blockSignals(False)
 
     def _toggle_favorite(self, state):
         if self.selected and self.selected.favorite != (
             state == QtCore.Qt.CheckState.Checked.value
         ):
-            self.selected.favorite = state == QtCore.Qt.CheckState.Checked.value
-            session.commit()
+            self.model.set_favorite(
+                self.selected, state == QtCore.Qt.CheckState.Checked.value
+            )
             show_toast(
                 self,
                 "Favorite",
@@ -98,6 +186,12 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
             self.model.refresh()
             self.model.layoutChanged.emit()
 
+    def _filter_color(self):
+        self.model.color_family = self.colorBox.currentData()
+        self.model.sort = self.sortBox.currentData()
+        self.model.refresh()
+        self.model.layoutChanged.emit()
+
     def _on_sleeve_clicked(self, index):
         self.selected = self.model.assets[index.row()]
 
@@ -120,45 +214,94 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
             local_file = file.toLocalFile()
 
             self.sleeveEdit.setText(local_file)
-            self.preview.setPixmap(QPixmap(local_file))
             self.service.image_path = local_file
+            self._update_preview()
 
     def _copy(self):
-        self.service.copy_bundle()
-        show_toast(
-            self,
-            "Sleeve Copying",
-            'Sleeve copied to the "sleeves" folder',
-            ToastPreset.SUCCESS_DARK,
+        service = copy(self.service)
+        self.jobs.submit(
+            f"Copying {service.bundle}",
+            service.copy_bundle,
+            lambda _: show_toast(
+                self,
+                "Sleeve Copying",
+                'Sleeve copied to the "sleeves" folder',
+                ToastPreset.SUCCESS_DARK,
+            ),
+            on_failed=self._show_job_error,
         )
 
     def _extract_texture(self):
-        self.service.extract_texture(self.service.bundle)
-        show_toast(
-            self,
-            "Sleeve Extraction",
-            'Sleeve extracted to the "sleeves" folder',
-            ToastPreset.SUCCESS_DARK,
+        service = copy(self.service)
+        self.jobs.submit(
+            f"Extracting {service.bundle}",
+            lambda job: service.extract_texture(service.bundle, job=job),
+            lambda _: show_toast(
+                self,
+                "Sleeve Extraction",
+                'Sleeve extracted to the "sleeves" folder',
+                ToastPreset.SUCCESS_DARK,
+            ),
+            on_failed=self._show_job_error,
         )
 
     def _replace_sleeve(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            self.service.create_backup(self.service.bundle)
-            self.model.set_backup_state(self.selected.id, True)
+        sleeve, service = self.selected, copy(self.service)
+        bundles = [sleeve.small_bundle, sleeve.medium_bundle]
+        backup = APP_CONFIG.create_backup and not sleeve.has_backup
+        # Set by the job once the backup is written, even if it is cancelled afterward
+        backed_up = []
 
-        for bundle in [self.selected.small_bundle, self.selected.medium_bundle]:
-            self.service.bundle = bundle
-            self.service.replace_bundle()
+        def replace(job):
+            # Checked again here, a replacement queued before this one may have
+            # made the backup already, and it must never be overwritten
+            if backup:
+                if not service.has_backup_file(service.bundle):
+                    job.stage(JobStage.LOADING, "backup")
+                    service.create_backup(service.bundle)
+                backed_up.append(True)
+            service.replace_bundles(bundles, job)
 
-        self.model.refresh()
-        self.current.setPixmap(
-            fetch_bundle_thumb(self.service.bundle, (256, 375)).pixmap(256, 375)
-        )
+        def ended():
+            if backed_up:
+                self.model.set_backup_state(sleeve.id, True)
+
+        def replaced(_):
+            ended()
+            self.model.refresh_thumbnail(sleeve)
+            if self.selected is sleeve:
+                self.current.setPixmap(
+                    fetch_bundle_thumb(sleeve.medium_bundle, (256, 375)).pixmap(
+                        256, 375
+                    )
+                )
+            show_toast(
+                self,
+                "Sleeve",
+                "Sleeve replacement successful",
+                ToastPreset.SUCCESS_DARK,
+            )
 
-        show_toast(
-            self, "Sleeve", "Sleeve replacement successful", ToastPreset.SUCCESS_DARK
+        def cancelled():
+            ended()
+            show_toast(
+                self,
+                "Sleeve",
+                "Sleeve replacement cancelled",
+                ToastPreset.INFORMATION_DARK,
+            )
+
+        def failed(error: Exception):
+            ended()
+            self._show_job_error(error)
+
+        self.jobs.submit(
+            f"Replacing {sleeve.medium_bundle}", replace, replaced, cancelled, failed
         )
 
+    def _show_job_error(self, error: Exception):
+        show_toast(self, "Sleeve", f"Operation failed: {error}", ToastPreset.ERROR_DARK)
+
     def _select_color(self):
         color = show_color_dialog()
 
@@ -171,25 +314,24 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         border_enabled = self.checkBox.isChecked()
         self.fadeCheckBox.setEnabled(border_enabled)
 
-        if border_enabled:
-            # For preview, we'll use a simple border - the actual fade effect will be applied during replacement
-            self.preview.setStyleSheet(
-                f"""
-                #preview {{
-                    border: 15px solid {self.service.border_color};
-                }}
-            """
-            )
-        else:
-            self.preview.setStyleSheet("")
+        if not border_enabled:
             self.fadeCheckBox.setChecked(False)
 
         self.service.border = border_enabled
         self.service.border_fade = self.fadeCheckBox.isChecked()
+        self._update_preview()
 
     def _toggle_fade(self):
         self.service.border_fade = self.fadeCheckBox.isChecked()
-        # Update preview to show fade effect indication (we'll keep the simple border for preview)
-        if self.fadeCheckBox.isChecked() and self.checkBox.isChecked():
-            # Could add a visual indicator that fade is enabled, but for now keep simple border
-            pass
+        self._update_preview()
+
+    def _update_preview(self):
+        """Renders the sleeve the current settings would create in the background"""
+        if not self.service.image_path:
+            return
+
+        path = self.service.image_path
+        border_color = self.service.border_color if self.service.border else None
+        fade = bool(self.service.border_fade)
+
+        self.previewer.request(lambda: render_sleeve_preview(path, border_color, fade))
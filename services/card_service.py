@@ -1,15 +1,16 @@
-from UnityPy.enums import TextureFormat
 from typing_extensions import override
 
 from database.models import CardModel
-from database.objects import session
+from database.objects import session_scope
 from services.unity_service import UnityService
 from unity.unity_utils import prepare_environment
-from UnityPy import load as unity_load
-
 from util.constants import APP_CONFIG
-from util.enums import CardArtCoordinates
-from util.image_utils import convert_image
+from util.enums import CardArtCoordinates, JobStage
+from util.image_pipeline import IMAGE_PIPELINE
+from util.job_runner import Job
+from util.lazy_import import lazy_import
+
+UnityPy = lazy_import("UnityPy")
 
 
 class CardService(UnityService):
@@ -19,60 +20,76 @@ class CardService(UnityService):
         self.unity_file: bool = False
 
     @override
-    def replace_bundle(self) -> None:
+    def encode_bundle(self, job: Job) -> list[tuple[str, bytes]]:
 
         if not self.bundle or not self.image_path:
-            return
-
-        card: CardModel = (
-            session.query(CardModel)
-            .filter(CardModel.large_bundle == self.bundle)
-            .first()
+            return []
+
+        # May run on a job thread, so the card is read through a session of its own
+        with session_scope() as db_session:
+            bundles = (
+                db_session.query(
+                    CardModel.small_bundle,
+                    CardModel.medium_bundle,
+                    CardModel.large_bundle,
+                )
+                .filter(CardModel.large_bundle == self.bundle)
+                .first()
+            )
+
+        if not bundles:
+            return []
+
+        sizes = [
+            CardArtCoordinates.SMALL,
+            CardArtCoordinates.MEDIUM,
+            CardArtCoordinates.LARGE,
+        ]
+
+        # Every art size is built from the same resolution pyramid of the new image
+        job.stage(JobStage.LOADING, self.image_path)
+        new_imgs = IMAGE_PIPELINE.process_sizes(
+            self.image_path,
+            [
+                (size.value[2] - size.value[0], size.value[3] - size.value[1])
+                for size in sizes
+            ],
         )
 
-        if card:
-            self.unity_file = card.unity_file
+        files = []
 
-        for bundle, size in zip(
-            [card.small_bundle, card.medium_bundle, card.large_bundle],
-            [
-                CardArtCoordinates.SMALL,
-                CardArtCoordinates.MEDIUM,
-                CardArtCoordinates.LARGE,
-            ],
-        ):
+        for bundle, size in zip(bundles, sizes):
 
+            job.stage(JobStage.LOADING, bundle)
             f_path = prepare_environment(self.unity_file, bundle)
-            env = unity_load(f_path)
+            env = UnityPy.load(f_path)
 
             for obj in env.objects:
                 if obj.type.name == "Texture2D":
 
                     data = obj.read()
+                    job.stage(JobStage.ENCODING, bundle)
 
                     # Get the original image from the bundle
                     original_img = data.image.copy()
 
-                    # Load and resize the new image to fit the coordinates area
-                    new_img = convert_image(self.image_path)
+                    # Take the new image resized to fit the coordinates area
                     coord_width = size.value[2] - size.value[0]  # right - left
                     coord_height = size.value[3] - size.value[1]  # bottom - top
-                    new_img = new_img.resize((coord_width, coord_height))
+                    new_img = new_imgs[(coord_width, coord_height)]
 
                     # Paste the new image onto the original at the specified coordinates
                     original_img.paste(new_img, (size.value[0], size.value[1]))
 
                     data.set_image(
                         img=original_img,
-                        target_format=TextureFormat.RGBA32,
+                        target_format=UnityPy.enums.TextureFormat.RGBA32,
                         mipmap_count=APP_CONFIG.mipmap_count,
                     )
 
                     data.save()
                     break
 
-            with open(f_path, "wb") as f:
-                f.write(env.file.save(packer=APP_CONFIG.packer))
+            files.append((f_path, env.file.save(packer=APP_CONFIG.packer)))
 
-    def get_names(self) -> list[str]:
-        return [card.name for card in session.query(CardModel).all()]
+        return files
@@ -0,0 +1,166 @@
+"""
+This module keeps a local mirror of the remote data files (version, sleeves, cards and
+fields). Files are only downloaded again when the server reports a change through their
+ETag or Last-Modified headers, and the mirrored copies are used when offline.
+"""
+
+import json
+import logging
+from os import environ, makedirs, remove, replace
+from os.path import dirname, exists, join
+from threading import Lock
+
+from util.lazy_import import lazy_import
+
+# Imported on the first download instead of on startup
+requests = lazy_import("requests")
+
+logger = logging.getLogger(__name__)
+
+# Where the remote data files are served from, the environment variable allows pointing
+# the application to another server (a local stand-in for tests, a fork...)
+REMOTE_DATA_URL: str = environ.get(
+    "FLOOWANDEREEZE_DATA_URL",
+    "https://raw.githubusercontent.com/Nauder/floowandereeze-and-modding-etl-dl/HEAD/",
+)
+
+# Where the mirrored files and their validators are stored
+MIRROR_DIR: str = join("cache", "data")
+
+# Bytes written to disk at once while downloading
+CHUNK_SIZE: int = 256 * 1024
+
+
+class DataMirror:
+    """
+    Local mirror of the remote data files, refreshed with conditional requests.
+
+    Attributes:
+        base_url: URL the file paths are relative to
+        directory: Local directory holding the mirrored files
+        timeout: Seconds to wait for the server before using the mirrored copy
+    """
+
+    def __init__(
+        self,
+        base_url: str = REMOTE_DATA_URL,
+        directory: str = MIRROR_DIR,
+        timeout: float = 10,
+    ):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.directory = directory
+        self.timeout = timeout
+        self._lock = Lock()
+        self._index_path = join(directory, "index.json")
+        self._index: dict[str, dict[str, str]] | None = None
+        self._session: "requests.Session | None" = None
+
+    def local_path(self, path: str) -> str:
+        """
+        Returns where the given remote file is mirrored.
+
+        :param path: Path of the file relative to the base URL
+        :return: The local path of the file
+        """
+        return join(self.directory, *path.split("/"))
+
+    def fetch(self, path: str) -> str:
+        """
+        Brings the mirrored copy of a remote file up to date, only downloading it when
+        it changed since the last fetch.
+
+        :param path: Path of the file relative to the base URL
+        :return: The local path of the up-to-date file, or of the last mirrored copy
+                 when the server can't be reached
+        :raises RequestException: If the server can't be reached and the file was
+                                  never mirrored
+        """
+        local = self.local_path(path)
+        validators = self._validators().get(path, {}) if exists(local) else {}
+
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        try:
+            with self._http().get(
+                self.base_url + path,
+                headers=headers,
+                timeout=self.timeout,
+                stream=True,
+            ) as response:
+                if response.status_code == 304:
+                    return local
+
+                response.raise_for_status()
+
+                # Streamed to disk, the file is never held in memory as a whole
+                makedirs(dirname(local), exist_ok=True)
+                with open(local + ".part", "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+        except requests.RequestException as e:
+            if exists(local + ".part"):
+                remove(local + ".part")
+            if exists(local):
+                logger.warning(f"Using mirrored {path}, remote unavailable: {e}")
+                return local
+            raise
+
+        replace(local + ".part", local)
+
+        self._store_validators(path, response.headers)
+
+        return local
+
+    def fetch_text(self, path: str) -> str:
+        """
+        Fetches a remote text file through the mirror.
+
+        :param path: Path of the file relative to the base URL
+        :return: The content of the file
+        """
+        with open(self.fetch(path), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _http(self) -> "requests.Session":
+        # One pooled session, so the files fetched together reuse their connections
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                for prefix in ("https://", "http://"):
+                    self._session.mount(
+                        prefix, requests.adapters.HTTPAdapter(pool_maxsize=4)
+                    )
+            return self._session
+
+    def _validators(self) -> dict[str, dict[str, str]]:
+        with self._lock:
+            if self._index is None:
+                self._index = {}
+                if exists(self._index_path):
+                    with open(self._index_path, "r", encoding="utf-8") as f:
+                        self._index = json.load(f)
+            return self._index
+
+    def _store_validators(self, path: str, headers) -> None:
+        validators = {}
+        if headers.get("ETag"):
+            validators["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["last_modified"] = headers["Last-Modified"]
+
+        index = self._validators()
+
+        with self._lock:
+            index[path] = validators
+            makedirs(self.directory, exist_ok=True)
+            with open(self._index_path + ".part", "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            replace(self._index_path + ".part", self._index_path)
+
+
+# Global mirror of the remote data
+DATA_MIRROR: DataMirror = DataMirror()
@@ -0,0 +1,212 @@
+"""
+This module finds exact and near-duplicate textures among the sleeves, cards and
+fields, so assets already modded under another bundle can be spotted.
+"""
+
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count, makedirs
+from os.path import dirname, exists, join
+
+import numpy as np
+from sqlalchemy import func
+
+from database.models import CardModel, FieldModel, SleeveModel, TextureHash
+from database.objects import DBsession
+from services.texture_index_service import MATCH_DISTANCE
+
+# Where the last report is cached, along with the fingerprint it was computed for
+REPORT_CACHE: str = join("cache", "duplicates.json")
+
+# Upper bound of distances computed at once by each worker, in matrix cells
+BLOCK_CELLS: int = 1 << 22
+
+
+def _catalog(db_session) -> dict[str, dict]:
+    """Maps the medium bundle of every asset to a description of the asset"""
+    catalog = {}
+
+    for model, kind in (
+        (SleeveModel, "Sleeve"),
+        (CardModel, "Card"),
+        (FieldModel, "Field"),
+    ):
+        columns = [model.id, model.medium_bundle]
+        if model is CardModel:
+            columns.append(model.name)
+
+        for row in db_session.query(*columns):
+            catalog[row[1]] = {
+                "type": kind,
+                "id": row[0],
+                "name": row[2] if model is CardModel else row[1],
+                "bundle": row[1],
+            }
+
+    return catalog
+
+
+def _fingerprint(db_session) -> list:
+    """Changes whenever a bundle is re-indexed, added or removed"""
+    return list(
+        db_session.query(
+            func.count(TextureHash.id),
+            func.sum(TextureHash.mtime),
+            func.max(TextureHash.mtime),
+        ).one()
+    ) + [
+        db_session.query(func.count(model.id)).scalar()
+        for model in (SleeveModel, CardModel, FieldModel)
+    ]
+
+
+def _near_groups(
+    hashes: np.ndarray, max_distance: int, workers: int
+) -> list[list[int]]:
+    """
+    Groups the rows within the given combined Hamming distance of each other (union-find).
+
+    Identical hashes, such as the ones of blank or solid textures, are compared once.
+    The upper triangle of the distance matrix of the distinct hashes is computed in row
+    blocks of at most BLOCK_CELLS cells, a few blocks at a time, and their pairs are
+    merged into the groups as they come, so memory stays bounded regardless of the
+    number of textures or of how many share a hash.
+    """
+    unique, inverse = np.unique(hashes, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    count = len(unique)
+    block = max(BLOCK_CELLS // max(count, 1), 1)
+    parents = list(range(count))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    def compare(start: int) -> tuple[np.ndarray, np.ndarray]:
+        rows = unique[start : start + block]
+        others = unique[start:]
+        distances = np.bitwise_count(rows[:, None, 0] ^ others[None, :, 0])
+        distances += np.bitwise_count(rows[:, None, 1] ^ others[None, :, 1])
+        first, second = np.nonzero(distances <= max_distance)
+        keep = second > first
+        return first[keep] + start, second[keep] + start
+
+    starts = range(0, count, block)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for window in range(0, len(starts), workers):
+            for firsts, seconds in executor.map(
+                compare, starts[window : window + workers]
+            ):
+                for first, second in zip(firsts.tolist(), seconds.tolist()):
+                    parents[find(first)] = find(second)
+
+    groups = defaultdict(list)
+    for row, hash_index in enumerate(inverse.tolist()):
+        groups[find(hash_index)].append(row)
+
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def build_duplicate_report(
+    max_distance: int = MATCH_DISTANCE, workers: int | None = None
+) -> dict:
+    """
+    Groups the sleeves, cards and fields whose textures are identical or nearly so.
+
+    The report is cached and only computed again once the texture index changes,
+    which happens when the bundle modification times do.
+
+    :param max_distance: Largest combined dHash + pHash distance between near-duplicates
+    :param workers: Number of threads comparing hashes, defaults to up to 4
+    :return: The report, with "exact" and "near" lists of asset groups
+    """
+    db_session = DBsession()
+
+    try:
+        fingerprint = _fingerprint(db_session) + [max_distance]
+
+        if exists(REPORT_CACHE):
+            with open(REPORT_CACHE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                return cached
+
+        catalog = _catalog(db_session)
+        rows = [
+            row
+            for row in db_session.query(
+                TextureHash.bundle,
+                TextureHash.dhash,
+                TextureHash.phash,
+                TextureHash.digest,
+            )
+            if row[0] in catalog
+        ]
+    finally:
+        db_session.close()
+
+    assets = [catalog[row[0]] for row in rows]
+
+    def describe(groups, skip_exact=False) -> list[list[dict]]:
+        described = []
+        for group in groups:
+            # Groups made only of identical textures are already listed as exact
+            if skip_exact and len({rows[i][3] for i in group} - {None}) == 1:
+                continue
+            # A bundle can hold several textures, each asset is listed once per group
+            members = {(assets[i]["type"], assets[i]["id"]): assets[i] for i in group}
+            if len(members) > 1:
+                described.append(list(members.values()))
+        return sorted(described, key=len, reverse=True)
+
+    by_digest = defaultdict(list)
+    for i, row in enumerate(rows):
+        if row[3]:
+            by_digest[row[3]].append(i)
+
+    hashes = np.array([row[1:3] for row in rows], dtype=np.int64).reshape(-1, 2)
+    near_groups = _near_groups(
+        hashes.view(np.uint64), max_distance, workers or min(cpu_count() or 1, 4)
+    )
+
+    report = {
+        "fingerprint": fingerprint,
+        "exact": describe(by_digest.values()),
+        "near": describe(near_groups, skip_exact=True),
+    }
+
+    makedirs(dirname(REPORT_CACHE), exist_ok=True)
+    with open(REPORT_CACHE, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+
+    return report
+
+
+def write_duplicate_report(report: dict, path: str = join("reports", "duplicates.txt")):
+    """
+    Writes a readable version of the given report.
+
+    :param report: Report created by build_duplicate_report
+    :param path: Where to write the report
+    :return: The path of the written report
+    """
+    makedirs(dirname(path) or ".", exist_ok=True)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for title, groups in (
+            ("Exact duplicates", report["exact"]),
+            ("Near duplicates", report["near"]),
+        ):
+            f.write(f"{title} ({len(groups)} groups)\n\n")
+            for number, group in enumerate(groups, 1):
+                f.write(f"Group {number}:\n")
+                for asset in group:
+                    f.write(
+                        f"    {asset['type']}: {asset['name']} ({asset['bundle']})\n"
+                    )
+                f.write("\n")
+
+    return path
@@ -1,15 +1,16 @@
-from UnityPy.enums import TextureFormat
 from typing_extensions import override
 
 from database.models import FieldModel
 from database.objects import session
 from services.unity_service import UnityService
 from unity.unity_utils import prepare_environment
-from UnityPy import load as unity_load
-
 from util.constants import APP_CONFIG
-from util.enums import FieldCoordinates
-from util.image_utils import convert_image, paste_scaled_image
+from util.enums import FieldCoordinates, JobStage
+from util.image_pipeline import IMAGE_PIPELINE
+from util.job_runner import Job
+from util.lazy_import import lazy_import
+
+UnityPy = lazy_import("UnityPy")
 
 
 class FieldService(UnityService):
@@ -18,31 +19,32 @@ class FieldService(UnityService):
         super().__init__("fields")
 
     @override
-    def replace_bundle(self) -> None:
+    def encode_bundle(self, job: Job) -> list[tuple[str, bytes]]:
 
         if not self.bundle or not self.image_path:
-            return
+            return []
 
+        job.stage(JobStage.LOADING, self.bundle)
         f_path = prepare_environment(False, self.bundle)
-        env = unity_load(f_path)
+        env = UnityPy.load(f_path)
 
         for obj in env.objects:
             if obj.type.name == "Texture2D":
 
                 data = obj.read()
 
-                img = convert_image(self.image_path)
+                job.stage(JobStage.ENCODING, self.bundle)
+                img = IMAGE_PIPELINE.process(self.image_path)
 
                 data.m_Width, data.m_Height = img.size
 
                 data.set_image(
                     img=img,
-                    target_format=TextureFormat.RGBA32,
+                    target_format=UnityPy.enums.TextureFormat.RGBA32,
                     mipmap_count=APP_CONFIG.mipmap_count,
                 )
 
                 data.save()
                 break
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        return [(f_path, env.file.save(packer=APP_CONFIG.packer))]
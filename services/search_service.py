@@ -0,0 +1,211 @@
+"""
+This module provides the card search, backed by the card_search FTS5 index created by the
+migrations and kept in sync with the card table by triggers, and a typo-tolerant trigram
+index of the card names used when the full-text search finds nothing.
+"""
+
+import re
+from collections import defaultdict
+from threading import Lock
+
+import numpy as np
+from sqlalchemy import Select, column, literal_column, select, table, text
+
+from database.models import CardModel
+from database.objects import DBsession
+from util.python_utils import remove_alt_tags
+
+# Weight of each indexed column (name, small, medium and large bundle) in the ranking
+BM25_WEIGHTS: tuple[float, ...] = (10.0, 1.0, 1.0, 1.0)
+
+# Smallest trigram similarity (Jaccard, 0 to 1) between a search and a matching name
+MIN_SIMILARITY: float = 0.3
+
+_card_search = table("card_search", column("rowid"))
+
+
+def build_match_query(search: str, include_bundles: bool = False) -> str | None:
+    """
+    Turns user input into an FTS5 query where every word is matched as a prefix.
+
+    :param search: Text typed by the user
+    :param include_bundles: Whether the bundles are searched along with the name
+    :return: The FTS5 query, None if the input has no searchable word
+    """
+    words = re.findall(r"\w+", search)
+
+    if not words:
+        return None
+
+    terms = " ".join(f'"{word}"*' for word in words)
+
+    if include_bundles:
+        return terms
+
+    return f"name : ({terms})"
+
+
+def card_match_ids(search: str, include_bundles: bool = False) -> Select | None:
+    """
+    Builds a query of the ids of the cards matching the given search, in no order.
+
+    :param search: Text typed by the user
+    :param include_bundles: Whether the bundles are searched along with the name
+    :return: Select of rowid, None if the input has no searchable word
+    """
+    match = build_match_query(search, include_bundles)
+
+    if match is None:
+        return None
+
+    return select(_card_search.c.rowid).where(
+        text("card_search MATCH :match").bindparams(match=match)
+    )
+
+
+def card_matches(search: str, include_bundles: bool = False) -> Select | None:
+    """
+    Builds a query of the ids of the cards matching the given search, best first.
+
+    :param search: Text typed by the user
+    :param include_bundles: Whether the bundles are searched along with the name
+    :return: Select of (rowid, rank) ordered by bm25 rank, None if the input has no
+             searchable word
+    """
+    matches = card_match_ids(search, include_bundles)
+
+    if matches is None:
+        return None
+
+    rank = literal_column(
+        f"bm25(card_search, {', '.join(str(weight) for weight in BM25_WEIGHTS)})"
+    ).label("rank")
+
+    return matches.add_columns(rank).order_by(rank)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalises a card name for fuzzy matching, ignoring alt tags, case and punctuation.
+
+    :param name: Card name or search text
+    :return: The lowercase words of the name separated by single spaces
+    """
+    return " ".join(re.findall(r"\w+", remove_alt_tags(name).lower()))
+
+
+def trigrams(name: str) -> set[str]:
+    """
+    Splits a normalised name into its trigrams, padded so short words still have some.
+
+    :param name: Normalised name
+    :return: The distinct trigrams of the name
+    """
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    In-memory trigram index of the card names, ranking names by their similarity to a
+    search with vectorised posting counts. Cards sharing a name (alts) share an entry.
+
+    Built from the database on first use and again after `invalidate`, or ahead of
+    time with `ensure_loaded` on a background thread.
+
+    Attributes:
+        generation: Incremented on every invalidation, lets other caches of the card
+                    names know when to drop their entries
+    """
+
+    def __init__(self):
+        self._names: list[list[int]] = []
+        self._sizes = np.empty(0, dtype=np.int32)
+        self._postings: dict[str, np.ndarray] = {}
+        self._loaded = False
+        self._lock = Lock()
+        self._build_lock = Lock()
+        self.generation = 0
+
+    def invalidate(self) -> None:
+        """Marks the index as stale, it is rebuilt on the next search."""
+        with self._lock:
+            self._loaded = False
+            self.generation += 1
+
+    def ensure_loaded(self) -> None:
+        """Builds the index unless it is already up to date."""
+        with self._build_lock:
+            if not self._loaded:
+                self.load()
+
+    def load(self) -> None:
+        """Builds the index from the card names in the database."""
+        db_session = DBsession()
+        try:
+            rows = db_session.query(CardModel.id, CardModel.name).all()
+        finally:
+            db_session.close()
+
+        ids_by_name = defaultdict(list)
+        for card_id, name in rows:
+            ids_by_name[normalize_name(name or "")].append(card_id)
+
+        postings = defaultdict(list)
+        sizes = []
+        for index, name in enumerate(ids_by_name):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(index)
+
+        with self._lock:
+            self._names = list(ids_by_name.values())
+            self._sizes = np.array(sizes, dtype=np.int32)
+            self._postings = {
+                gram: np.array(indexes, dtype=np.int32)
+                for gram, indexes in postings.items()
+            }
+            self._loaded = True
+
+    def search(
+        self, search: str, limit: int = 200, min_similarity: float = MIN_SIMILARITY
+    ) -> list[tuple[int, float]]:
+        """
+        Finds the cards whose names are the most similar to the given search.
+
+        :param search: Text typed by the user
+        :param limit: Maximum number of distinct names returned
+        :param min_similarity: Smallest similarity of the returned names
+        :return: Card ids and similarities, most similar first
+        """
+        self.ensure_loaded()
+
+        with self._lock:
+            names, sizes, postings = self._names, self._sizes, self._postings
+
+        grams = trigrams(normalize_name(search))
+        hits = [postings[gram] for gram in grams if gram in postings]
+
+        if not hits or not names:
+            return []
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(names))
+        similarity = shared / (sizes + len(grams) - shared)
+
+        candidates = np.flatnonzero(similarity >= min_similarity)
+        if len(candidates) > limit:
+            candidates = candidates[
+                np.argpartition(similarity[candidates], -limit)[-limit:]
+            ]
+        candidates = candidates[np.argsort(-similarity[candidates], kind="stable")]
+
+        return [
+            (card_id, float(similarity[index]))
+            for index in candidates
+            for card_id in names[index]
+        ]
+
+
+# Global trigram index of the card names
+CARD_NAME_INDEX: TrigramIndex = TrigramIndex()
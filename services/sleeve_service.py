@@ -1,16 +1,14 @@
-from UnityPy.enums import TextureFormat
 from typing_extensions import override
 
 from services.unity_service import UnityService
 from unity.unity_utils import prepare_environment
-from UnityPy import load as unity_load
-
 from util.constants import APP_CONFIG
-from util.image_utils import (
-    add_sleeve_border,
-    add_sleeve_border_with_fade,
-    convert_image,
-)
+from util.enums import JobStage
+from util.image_pipeline import IMAGE_PIPELINE
+from util.job_runner import Job
+from util.lazy_import import lazy_import
+
+UnityPy = lazy_import("UnityPy")
 
 
 class SleeveService(UnityService):
@@ -22,36 +20,32 @@ class SleeveService(UnityService):
         self.border_fade: bool | None = None
 
     @override
-    def replace_bundle(self) -> None:
+    def encode_bundle(self, job: Job) -> list[tuple[str, bytes]]:
 
         if not self.bundle or not self.image_path:
-            return
+            return []
 
+        job.stage(JobStage.LOADING, self.bundle)
         f_path = prepare_environment(False, self.bundle)
-        env = unity_load(f_path)
+        env = UnityPy.load(f_path)
 
         for obj in env.objects:
             if obj.type.name == "Texture2D":
 
                 data = obj.read()
 
-                if self.border:
-                    if self.border_fade:
-                        img = add_sleeve_border_with_fade(
-                            convert_image(self.image_path), self.border_color
-                        )
-                    else:
-                        img = add_sleeve_border(
-                            convert_image(self.image_path), self.border_color
-                        )
-                else:
-                    img = convert_image(self.image_path)
+                job.stage(JobStage.ENCODING, self.bundle)
+                img = IMAGE_PIPELINE.process(
+                    self.image_path,
+                    border=self.border_color if self.border else None,
+                    fade=bool(self.border_fade),
+                )
 
                 data.m_Width, data.m_Height = img.size
 
                 data.set_image(
                     img=img,
-                    target_format=TextureFormat.RGBA32,
+                    target_format=UnityPy.enums.TextureFormat.RGBA32,
                     mipmap_count=APP_CONFIG.mipmap_count,
                 )
 
@@ -69,5 +63,4 @@ class SleeveService(UnityService):
                 )
                 obj.save_typetree(type_tree)
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        return [(f_path, env.file.save(packer=APP_CONFIG.packer))]
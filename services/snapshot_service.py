@@ -0,0 +1,231 @@
+"""
+This module saves the state of the asset list models on exit, so the next launch shows the
+grids without decoding every bundle again. A snapshot holds the model filters, the rows in
+display order and their thumbnails packed in one file, which is memory-mapped on load so a
+thumbnail is only read when its row is painted.
+
+Snapshot layout: magic, format and header length (see `_PREFIX`), a JSON header with the
+state and the rows, then the encoded thumbnails back to back.
+"""
+
+import json
+import logging
+import mmap
+import struct
+from io import BytesIO
+from os import makedirs, remove, replace, stat
+from os.path import exists, join
+
+from PIL import Image
+from PySide6 import QtGui
+
+from unity.unity_utils import prepare_environment
+
+logger = logging.getLogger(__name__)
+
+# Where the snapshots are stored
+SNAPSHOT_DIR: str = join("cache", "snapshots")
+
+# Bumped whenever the layout changes, older snapshots are then ignored
+SNAPSHOT_FORMAT: int = 1
+
+_MAGIC = b"FLSN"
+_PREFIX = struct.Struct("<4sII")
+
+
+def bundle_mtime(bundle: str, unity_file: bool = False) -> int:
+    """
+    Returns the modification time of a bundle, changed whenever the bundle is modded.
+
+    :param bundle: Bundle name
+    :param unity_file: Whether the bundle is in the game install instead of the data folder
+    :return: Modification time in nanoseconds, 0 if the bundle doesn't exist
+    """
+    try:
+        return stat(prepare_environment(unity_file, bundle)).st_mtime_ns
+    except (OSError, TypeError):
+        return 0
+
+
+def encode_thumbnail(img: Image.Image) -> bytes:
+    """
+    Encodes a thumbnail for a snapshot, as JPEG when it is opaque and PNG otherwise.
+
+    :param img: Thumbnail, already at its display size
+    :return: The encoded image
+    """
+    buffer = BytesIO()
+
+    if img.mode == "RGBA" and img.getchannel("A").getextrema()[0] < 255:
+        img.save(buffer, "PNG", compress_level=1)
+    else:
+        img.convert("RGB").save(buffer, "JPEG", quality=90)
+
+    return buffer.getvalue()
+
+
+class ModelSnapshot:
+    """
+    Saved state of an asset list model.
+
+    Attributes:
+        name: Name of the model, used as the file name
+        directory: Where the snapshots are stored
+        path: Where this snapshot is stored
+        state: Filters of the model when it was saved, empty if nothing was loaded
+    """
+
+    def __init__(self, name: str, directory: str = SNAPSHOT_DIR):
+        self.name = name
+        self.directory = directory
+        self.path = join(directory, f"{name}.snapshot")
+        self.state: dict = {}
+        # Asset id -> (bundle, unity file, bundle mtime, thumbnail offset, length)
+        self._rows: dict[int, tuple[str, bool, int, int, int]] = {}
+        self._file = None
+        self._map: mmap.mmap | None = None
+
+    def load(self) -> bool:
+        """
+        Maps the snapshot, if there is a valid one.
+
+        :return: Whether a snapshot was loaded
+        """
+        self.close()
+
+        if not exists(self.path):
+            return False
+
+        try:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, version, length = _PREFIX.unpack_from(self._map)
+            if magic != _MAGIC or version != SNAPSHOT_FORMAT:
+                raise ValueError(f"unsupported snapshot format {version}")
+
+            header = json.loads(self._map[_PREFIX.size : _PREFIX.size + length])
+            blob = _PREFIX.size + length
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Ignoring the {self.name} snapshot: {e}")
+            self.close()
+            return False
+
+        self.state = header["state"]
+        self._rows = {
+            asset_id: (bundle, unity_file, mtime, blob + offset, size)
+            for asset_id, bundle, unity_file, mtime, offset, size in header["rows"]
+        }
+
+        return True
+
+    def has(self, asset_id: int, bundle: str) -> bool:
+        """
+        Whether the snapshot holds a thumbnail of the given asset and bundle.
+
+        :param asset_id: Id of the asset
+        :param bundle: Bundle the thumbnail is made from
+        """
+        row = self._rows.get(asset_id)
+        return row is not None and row[0] == bundle and row[4] > 0
+
+    def unity_file(self, asset_id: int) -> bool:
+        """Whether the thumbnail of the given asset came from the game install."""
+        return self._rows[asset_id][1]
+
+    def thumb(self, asset_id: int) -> QtGui.QIcon | None:
+        """
+        Decodes the thumbnail of an asset.
+
+        :param asset_id: Id of the asset
+        :return: The thumbnail, None if the snapshot doesn't hold it
+        """
+        data = self.encoded(asset_id)
+
+        if data is None:
+            return None
+
+        pixmap = QtGui.QPixmap()
+        pixmap.loadFromData(data)
+
+        return QtGui.QIcon(pixmap)
+
+    def encoded(self, asset_id: int) -> bytes | None:
+        """
+        Returns the thumbnail of an asset as stored.
+
+        :param asset_id: Id of the asset
+        :return: The encoded thumbnail, None if the snapshot doesn't hold it
+        """
+        row = self._rows.get(asset_id)
+
+        if row is None or self._map is None or row[4] == 0:
+            return None
+
+        return self._map[row[3] : row[3] + row[4]]
+
+    def mtime(self, asset_id: int) -> int:
+        """Returns the bundle modification time the thumbnail of an asset was made at."""
+        return self._rows[asset_id][2]
+
+    def stale(self, assets: list[tuple[int, str]]) -> list[int]:
+        """
+        Finds the assets whose bundle changed since their thumbnail was made. Only reads
+        file metadata, so it can run on any thread.
+
+        :param assets: Ids and bundles of the assets whose thumbnail comes from the snapshot
+        :return: Ids of the assets whose thumbnail must be made again
+        """
+        return [
+            asset_id
+            for asset_id, bundle in assets
+            if bundle_mtime(bundle, self._rows[asset_id][1]) != self._rows[asset_id][2]
+        ]
+
+    def save(
+        self,
+        state: dict,
+        rows: list[tuple[int, str, bool, int, bytes | None]],
+    ) -> None:
+        """
+        Replaces the snapshot, the mapped one is closed once the new one is written.
+
+        :param state: Filters of the model
+        :param rows: Asset id, bundle, unity file, bundle mtime and encoded thumbnail of
+                     every row, in display order
+        """
+        header_rows = []
+        offset = 0
+        for asset_id, bundle, unity_file, mtime, data in rows:
+            size = len(data) if data else 0
+            header_rows.append((asset_id, bundle, unity_file, mtime, offset, size))
+            offset += size
+
+        header = json.dumps({"state": state, "rows": header_rows}).encode("utf-8")
+
+        makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.path + ".part", "wb") as f:
+                f.write(_PREFIX.pack(_MAGIC, SNAPSHOT_FORMAT, len(header)))
+                f.write(header)
+                for *_, data in rows:
+                    if data:
+                        f.write(data)
+        except OSError as e:
+            logger.warning(f"Could not save the {self.name} snapshot: {e}")
+            if exists(self.path + ".part"):
+                remove(self.path + ".part")
+            return
+
+        # A mapped file can't be replaced on Windows
+        self.close()
+        replace(self.path + ".part", self.path)
+
+    def close(self) -> None:
+        """Unmaps the snapshot, the thumbnails it holds can't be read afterwards."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,282 @@
+"""
+This module provides a perceptual hash index of the game textures, used to find which
+bundles hold an image similar to a given one.
+"""
+
+import logging
+from hashlib import blake2b
+from os import scandir
+from threading import Lock, Thread
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import or_
+
+from database.models import CardModel, IndexedBundle, TextureHash, UnityAsset
+from database.objects import DBsession
+from util.constants import APP_CONFIG
+from util.enums import CardArtCoordinates
+from util.image_pipeline import IMAGE_PIPELINE
+from util.image_utils import dhash, phash
+from util.lazy_import import lazy_import
+
+UnityPy = lazy_import("UnityPy")
+
+logger = logging.getLogger(__name__)
+
+# Largest combined dHash + pHash distance (out of 128 bits) considered a match
+MATCH_DISTANCE: int = 16
+
+# Largest number of bundles bound in a single IN clause
+SQL_CHUNK: int = 900
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64 bit, so unsigned hashes are stored wrapped"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hash_image(image: Image.Image) -> tuple[int, int]:
+    """
+    Hashes an image for the texture index.
+
+    :param image: Image to be hashed
+    :return: The dHash and pHash of the image, as unsigned integers
+    """
+    return dhash(image), phash(image)
+
+
+def digest_image(image: Image.Image) -> str:
+    """
+    Hashes the decoded pixels of an image, equal only for identical images.
+
+    :param image: Image to be hashed
+    :return: Hex digest of the image size, mode and pixels
+    """
+    hasher = blake2b(f"{image.size}{image.mode}".encode(), digest_size=16)
+    hasher.update(image.tobytes())
+
+    return hasher.hexdigest()
+
+
+class TextureHashIndex:
+    """
+    In-memory copy of the texture hashes, searched with vectorised Hamming distances.
+
+    Attributes:
+        bundles: Bundle of each indexed texture
+        hashes: dHash and pHash of each indexed texture, one row per texture
+    """
+
+    def __init__(self):
+        self.bundles = np.empty(0, dtype=object)
+        self.hashes = np.empty((0, 2), dtype=np.uint64)
+        self._lock = Lock()
+
+    def load(self) -> None:
+        """Loads the stored hashes from the database."""
+        db_session = DBsession()
+        try:
+            rows = db_session.query(
+                TextureHash.bundle, TextureHash.dhash, TextureHash.phash
+            ).all()
+        finally:
+            db_session.close()
+
+        bundles = np.array([row[0] for row in rows], dtype=object)
+        hashes = np.array([row[1:] for row in rows], dtype=np.int64).reshape(-1, 2)
+
+        with self._lock:
+            self.bundles = bundles
+            self.hashes = hashes.view(np.uint64)
+
+    def search(self, image: Image.Image, limit: int = 5) -> list[tuple[str, int]]:
+        """
+        Finds the indexed textures closest to the given image.
+
+        :param image: Image to look up
+        :param limit: Maximum number of results
+        :return: Bundles and combined Hamming distances, closest first
+        """
+        query = np.array(hash_image(image), dtype=np.uint64)
+
+        with self._lock:
+            bundles, hashes = self.bundles, self.hashes
+
+        if not len(bundles):
+            return []
+
+        distances = np.bitwise_count(hashes ^ query).sum(axis=1, dtype=np.int32)
+
+        limit = min(limit, len(distances))
+        closest = np.argpartition(distances, limit - 1)[:limit]
+        closest = closest[np.argsort(distances[closest], kind="stable")]
+
+        return [(bundles[i], int(distances[i])) for i in closest]
+
+
+# Global index shared by the pages
+TEXTURE_INDEX: TextureHashIndex = TextureHashIndex()
+
+
+def _card_crops(db_session) -> dict[str, tuple[int, int, int, int]]:
+    """Card textures are hashed on their art area only, so they match the raw artwork"""
+    crops = {}
+
+    for small, medium, large in db_session.query(
+        CardModel.small_bundle, CardModel.medium_bundle, CardModel.large_bundle
+    ):
+        crops[small] = CardArtCoordinates.SMALL.value
+        crops[medium] = CardArtCoordinates.MEDIUM.value
+        if large:
+            crops[large] = CardArtCoordinates.LARGE.value
+
+    return crops
+
+
+def index_textures() -> int:
+    """
+    Hashes every Texture2D of the bundles in the game directory, skipping the bundles
+    that did not change since they were last indexed, and reloads the global index.
+
+    :return: The number of bundles (re)indexed
+    """
+    db_session = DBsession()
+    indexed = 0
+
+    try:
+        # Every visited bundle is recorded, even the ones that gave no texture
+        known = dict(db_session.query(IndexedBundle.bundle, IndexedBundle.mtime))
+        crops = _card_crops(db_session)
+        present = set()
+
+        for folder in scandir(APP_CONFIG.game_path):
+            if not folder.is_dir() or len(folder.name) != 2:
+                continue
+
+            for entry in scandir(folder.path):
+                if not entry.is_file():
+                    continue
+
+                bundle = entry.name
+                mtime = entry.stat().st_mtime
+                present.add(bundle)
+
+                if known.get(bundle) == mtime:
+                    continue
+
+                try:
+                    textures = [
+                        (obj.path_id, obj.read().image)
+                        for obj in UnityPy.load(entry.path).objects
+                        if obj.type.name == "Texture2D"
+                    ]
+                except Exception as e:
+                    # Not tried again until the bundle changes
+                    logger.warning(f"Could not index bundle {bundle}: {e}")
+                    textures = []
+
+                db_session.merge(IndexedBundle(bundle=bundle, mtime=mtime))
+                db_session.query(TextureHash).filter(
+                    TextureHash.bundle == bundle
+                ).delete()
+
+                for path_id, image in textures:
+                    if bundle in crops:
+                        image = image.crop(crops[bundle])
+                    d_hash, p_hash = hash_image(image)
+                    db_session.add(
+                        TextureHash(
+                            bundle=bundle,
+                            path_id=path_id,
+                            dhash=_to_signed(d_hash),
+                            phash=_to_signed(p_hash),
+                            digest=digest_image(image),
+                            mtime=mtime,
+                        )
+                    )
+
+                indexed += 1
+                if indexed % 500 == 0:
+                    db_session.commit()
+
+        removed = list(set(known) - present)
+        for i in range(0, len(removed), SQL_CHUNK):
+            chunk = removed[i : i + SQL_CHUNK]
+            db_session.query(TextureHash).filter(TextureHash.bundle.in_(chunk)).delete()
+            db_session.query(IndexedBundle).filter(
+                IndexedBundle.bundle.in_(chunk)
+            ).delete()
+
+        db_session.commit()
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Texture indexing failed: {e}")
+    finally:
+        db_session.close()
+
+    TEXTURE_INDEX.load()
+
+    return indexed
+
+
+def start_texture_indexer() -> Thread:
+    """
+    Loads the stored index and updates it on a background thread.
+
+    :return: The indexer thread
+    """
+    TEXTURE_INDEX.load()
+
+    thread = Thread(target=index_textures, daemon=True)
+    thread.start()
+
+    return thread
+
+
+def find_matching_assets(
+    path: str, db_model: type[UnityAsset], limit: int = 5
+) -> list[UnityAsset]:
+    """
+    Finds the assets of the given model whose textures match the given image.
+
+    :param path: Path to the image to look up
+    :param db_model: Asset model to search (SleeveModel, CardModel, FieldModel)
+    :param limit: Maximum number of results
+    :return: The matching assets, closest first
+    """
+    matches = [
+        bundle
+        for bundle, distance in TEXTURE_INDEX.search(
+            IMAGE_PIPELINE.process(path), limit * 4
+        )
+        if distance <= MATCH_DISTANCE
+    ]
+
+    if not matches:
+        return []
+
+    columns = [
+        getattr(db_model, column)
+        for column in ("small_bundle", "medium_bundle", "large_bundle")
+        if hasattr(db_model, column)
+    ]
+
+    db_session = DBsession()
+    try:
+        assets = (
+            db_session.query(db_model)
+            .filter(or_(*[column.in_(matches) for column in columns]))
+            .all()
+        )
+    finally:
+        db_session.close()
+
+    def rank(asset):
+        return min(
+            matches.index(getattr(asset, column.key))
+            for column in columns
+            if getattr(asset, column.key) in matches
+        )
+
+    return sorted(assets, key=rank)[:limit]
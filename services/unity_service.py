@@ -10,11 +10,14 @@ from os import makedirs
 from os.path import join, isfile
 from shutil import copyfile
 
-from UnityPy import load as unity_load
-
 from unity.unity_utils import prepare_environment
 from util.constants import APP_CONFIG
+from util.enums import JobStage
 from util.image_utils import slugify
+from util.job_runner import Job
+from util.lazy_import import lazy_import
+
+UnityPy = lazy_import("UnityPy")
 
 
 class UnityService(ABC):
@@ -28,15 +31,48 @@ class UnityService(ABC):
         self.image_path: str | None = None
 
     @abstractmethod
-    def replace_bundle(self) -> None:
+    def encode_bundle(self, job: Job) -> list[tuple[str, bytes]]:
         """
-        Replaces a Unity asset bundle with a new image.
+        Builds the current bundle with the new image, without writing it.
 
-        :return: None
+        :param job: Progress of the replacement, its loading and encoding stages are
+                    reported
+        :return: Path and content of every bundle file to write
         :raises NotImplementedError: This method is not implemented in the base class.
         """
 
-    def extract_texture(self, name: str, miss=False) -> None:
+    def replace_bundle(self, job: Job | None = None) -> None:
+        """
+        Replaces the current Unity asset bundle with the new image.
+
+        :param job: Progress of the replacement, when run in the background
+        :return: None
+        """
+        self.replace_bundles([self.bundle], job)
+
+    def replace_bundles(self, bundles: list[str], job: Job | None = None) -> None:
+        """
+        Replaces Unity asset bundles with the new image. Every bundle is encoded before
+        the first one is written, so a cancelled job leaves them all untouched.
+
+        :param bundles: The bundles to replace, the current bundle is left on the last one
+        :param job: Progress of the replacement, when run in the background
+        :return: None
+        :raises JobCancelled: If the job was cancelled before writing
+        """
+        job = job or Job()
+        files = []
+
+        for bundle in bundles:
+            self.bundle = bundle
+            files.extend(self.encode_bundle(job))
+
+        job.stage(JobStage.WRITING, self.bundle or "")
+        for path, content in files:
+            with open(path, "wb") as f:
+                f.write(content)
+
+    def extract_texture(self, name: str, miss=False, job: Job | None = None) -> None:
         """
         Extracts a texture from a Unity bundle.
 
@@ -44,11 +80,14 @@ class UnityService(ABC):
         :param field: If the bundle is a field or not.
         :param miss: A boolean value indicating if the extraction failed to find the bundle in the
         LocalData folder.
+        :param job: Progress of the extraction, when run in the background
         :return: None
         """
-        self.extract_asset_texture(name, "images", miss)
+        self.extract_asset_texture(name, "images", miss, job)
 
-    def create_backup(self, name: str, field=False, miss=False) -> None:
+    def create_backup(
+        self, name: str, field=False, miss=False, job: Job | None = None
+    ) -> None:
         """
         Creates a backup of a Unity asset bundle.
 
@@ -56,23 +95,38 @@ class UnityService(ABC):
         :param field: If the bundle is a field or not.
         :param miss: A boolean value indicating if the extraction failed to find the bundle in the
         LocalData folder.
+        :param job: Progress of the backup, when run in the background
         :return: None
 
         """
-        self.extract_asset_texture(name, "backups", field, miss)
+        self.extract_asset_texture(name, "backups", miss, job)
 
-    def extract_asset_texture(self, name: str, folder: str, miss=False) -> None:
+    def has_backup_file(self, name: str) -> bool:
+        """
+        Whether a backup of the given texture was already extracted.
+
+        :param name: The name of the texture.
+        :return: True if the backup file exists
+        """
+        return isfile(join("backups", self.subfolder, slugify(name) + ".png"))
+
+    def extract_asset_texture(
+        self, name: str, folder: str, miss=False, job: Job | None = None
+    ) -> None:
         """
         Extracts a texture from a Unity bundle.
 
         :param field: If the bundle is a field or not.
         :param name: The name of the texture to extract.
         :param miss: A boolean value indicating if the extraction failed to find the bundle.
+        :param job: Progress of the extraction, when run in the background
         :return: None
         """
         found = False
+        job = job or Job()
 
-        for obj in unity_load(prepare_environment(miss, self.bundle)).objects:
+        job.stage(JobStage.LOADING, self.bundle)
+        for obj in UnityPy.load(prepare_environment(miss, self.bundle)).objects:
             if obj.type.name == "Texture2D":
                 data = obj.read()
 
@@ -83,16 +137,18 @@ class UnityService(ABC):
                     dest = join(folder, self.subfolder, slugify(name) + ".png")
 
                     img = data.image
+                    job.stage(JobStage.WRITING, dest)
                     img.save(dest)
                     break
         else:
-            return self.extract_texture(name, True)
+            return self.extract_texture(name, True, job)
 
-    def restore_asset(self, backup_name=None) -> bool:
+    def restore_asset(self, backup_name=None, job: Job | None = None) -> bool:
         """
         Restores a backup of a Unity asset bundle.
 
         :param backup_name: The name of the backup to restore.
+        :param job: Progress of the restoration, when run in the background
         :return: A boolean value indicating if the backup was restored successfully.
         """
 
@@ -102,24 +158,30 @@ class UnityService(ABC):
         if isfile(backup_path):
             current_image = self.image_path
             self.image_path = backup_path
-            self.replace_bundle()
-            self.image_path = current_image
+            try:
+                self.replace_bundle(job)
+            finally:
+                self.image_path = current_image
             return True
         return False
 
-    def copy_bundle(self) -> None:
+    def copy_bundle(self, job: Job | None = None) -> None:
         """
         Copies the current bundle to the bundles folder.
+
+        :param job: Progress of the copy, when run in the background
         """
-        self.create_bundle_copy("bundles")
+        self.create_bundle_copy("bundles", job)
 
-    def create_bundle_copy(self, folder="bundles") -> None:
+    def create_bundle_copy(self, folder="bundles", job: Job | None = None) -> None:
         """
         Creates a copy of the current bundle in the specified folder.
 
         :param folder: The folder to create the copy in.
+        :param job: Progress of the copy, when run in the background
         :return: None
         """
+        (job or Job()).stage(JobStage.WRITING, self.bundle)
 
         makedirs(join(folder, self.subfolder), exist_ok=True)
 
@@ -1,183 +1,265 @@
 """
 This module provides functionality to update the database with the latest data from the remote
-source.
+source, read through the local mirror kept by `services.data_mirror`.
 """
 
-import pandas as pd
-import requests
-from requests.exceptions import RequestException, Timeout, HTTPError
-from pandas import read_parquet, DataFrame
-from pandas.errors import EmptyDataError
+import logging
+from time import perf_counter
 
-from database.models import SleeveModel, CardModel, FieldModel
-from database.objects import session
+from typing import Iterable, Iterator
 
+from sqlalchemy import bindparam, delete, insert, select, update
 
-def get_github_raw_file(
-    path: str, owner="Nauder", repo="floowandereeze-and-modding-etl-dl"
-) -> str:
-    """
-    Fetch a raw file from a private GitHub repository using GitHub REST API.
+from database.models import SleeveModel, CardModel, FieldModel
+from database.objects import session_scope
+from services.data_mirror import DATA_MIRROR
+from services.search_service import CARD_NAME_INDEX
+from util.lazy_import import lazy_import
 
-    :param owner: GitHub username or organization name that owns the repository.
-    :param repo: Repository name.
-    :param path: Path to the file in the repository.
+# Only needed while updating, so kept out of the startup
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
 
-    :return: The raw content of the file.
-    :raises HTTPError: If the GitHub API request fails
-    :raises Timeout: If the request times out
-    :raises RequestException: For other request-related errors
-    :raises ValueError: If the response doesn't contain a download URL
-    """
-    # GitHub API URL for repository contents
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
+logger = logging.getLogger(__name__)
 
-    # Headers for authentication
-    headers = {"Accept": "application/vnd.github.v3+json"}
+# Largest number of ids bound in a single IN clause
+SQL_CHUNK: int = 900
 
-    try:
-        # Send a GET request to fetch file metadata
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raises HTTPError for bad responses
+# Rows decoded at once from the remote parquet files
+BATCH_SIZE: int = 4096
 
-        file_data = response.json()
 
-        # Extract the download URL from the response
-        if "download_url" not in file_data:
-            raise ValueError("No download URL found in the response.")
+def get_remote_text(path: str) -> str:
+    """
+    Fetch a remote text file through the local data mirror.
 
-        raw_url = file_data["download_url"]
+    :param path: Path to the file relative to the remote data URL.
 
-        # Send a second GET request to fetch the raw file content
-        raw_response = requests.get(raw_url, headers=headers, timeout=10)
-        raw_response.raise_for_status()
+    :return: The content of the file, from the mirror when it did not change or the
+             remote can't be reached.
+    :raises RequestException: If the remote can't be reached and the file was never
+                              mirrored
+    """
+    return DATA_MIRROR.fetch_text(path)
 
-        return raw_response.text
 
-    except Timeout as e:
-        raise Timeout(f"Request timed out: {str(e)}") from e
-    except HTTPError as e:
-        raise HTTPError(f"GitHub API request failed: {str(e)}") from e
-    except RequestException as e:
-        raise RequestException(f"Request failed: {str(e)}") from e
+def get_remote_batches(
+    path: str, columns: list[str], required: tuple[str, ...] = ()
+) -> Iterator["pa.RecordBatch"]:
+    """
+    Fetch a remote parquet file through the local data mirror and read it in batches,
+    only decoding the given columns.
 
+    :param path: Path to the file relative to the remote data URL.
+    :param columns: Columns to read, the others are never decoded.
+    :param required: Columns whose null rows are skipped.
 
-def get_github_parquet_file(
-    path: str, owner="Nauder", repo="floowandereeze-and-modding-etl-dl"
-) -> DataFrame:
-    """
-    Fetch a raw file from a private GitHub repository using GitHub REST API.
-
-    :param owner: GitHub username or organization name that owns the repository.
-    :param repo: Repository name.
-    :param path: Path to the file in the repository.
-
-    :return: The raw content of the file as a pandas DataFrame.
-    :raises HTTPError: If the GitHub API request fails
-    :raises Timeout: If the request times out
-    :raises RequestException: For other request-related errors
-    :raises ValueError: If the response doesn't contain a download URL
-    :raises EmptyDataError: If the parquet file is empty or invalid
+    :return: The record batches of the file, with the given columns in order.
+    :raises RequestException: If the remote can't be reached and the file was never
+                              mirrored
+    :raises ArrowInvalid: If the parquet file is empty or invalid
     """
-    # GitHub API URL for repository contents
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-
-    # Headers for authentication
-    headers = {"Accept": "application/vnd.github.v3+json"}
+    parquet = pq.ParquetFile(DATA_MIRROR.fetch(path))
 
     try:
-        # Send a GET request to fetch file metadata
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        file_data = response.json()
-
-        # Extract the download URL from the response
-        if "download_url" not in file_data:
-            raise ValueError("No download URL found in the response.")
+        for batch in parquet.iter_batches(batch_size=BATCH_SIZE, columns=columns):
+            for column in required:
+                batch = batch.filter(pc.is_valid(batch.column(column)))
+            yield batch
+    finally:
+        parquet.close()
+
+
+def _sync_table(
+    db_model: type,
+    batches: Iterable["pa.RecordBatch"],
+    columns: dict[str, str],
+    key: str = "medium_bundle",
+) -> dict[str, int]:
+    """
+    Brings a table in line with the given remote rows in one transaction, touching only
+    the rows that changed. Runs on its own session so several tables can sync at once.
+
+    The local rows are loaded first, as their key, id and a hash of the compared values.
+    The remote batches are then diffed against them and written one at a time, so the
+    remote rows are never all held in memory. Rows are matched on their bundle, new ones
+    are inserted, changed ones updated and the ones missing from the remote deleted last.
+    Columns that are not part of the remote data (favorite, has_backup, ...) are left
+    as they are.
+
+    :param db_model: Model of the table to sync
+    :param batches: Remote data, with the columns of `columns` in order
+    :param columns: Model column name for each remote column used
+    :param key: Model column identifying a row in both sides
+    :return: The number of inserted, updated and deleted rows
+    """
+    start = perf_counter()
+
+    names = list(columns.values())
+    key_index = names.index(key)
+    table = db_model.__table__
+    # Unique columns besides the key, a row taking over the value of a row that is
+    # deleted at the end must wait for it
+    unique = [
+        (index, name)
+        for index, name in enumerate(names)
+        if name != key and table.c[name].unique
+    ]
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    with session_scope() as db_session:
+        # Core statements on the session connection, the ORM bulk paths would split
+        # the executemany wherever the null columns of consecutive rows differ
+        connection = db_session.connection()
+
+        # Key -> (id, hash of the compared values), None once matched by a remote row
+        local = {}
+        # Local row holding each unique value
+        owners = {}
+        for row_id, *values in connection.execute(
+            select(table.c.id, *(table.c[name] for name in names))
+        ):
+            local[values[key_index]] = (row_id, hash(tuple(values)))
+            for index, name in unique:
+                if values[index] is not None:
+                    owners[name, values[index]] = values[key_index]
+
+        new_keys = set()
+        deferred_updates, deferred_inserts = [], []
+
+        def write(updated: list[dict], inserted: list[dict]) -> None:
+            if updated:
+                connection.execute(
+                    update(table).where(table.c.id == bindparam("_id")), updated
+                )
+            if inserted:
+                connection.execute(insert(table), inserted)
+            counts["updated"] += len(updated)
+            counts["inserted"] += len(inserted)
+
+        for batch in batches:
+            updated, inserted = [], []
+
+            for row in zip(*(column.to_pylist() for column in batch.columns)):
+                bundle = row[key_index]
+                entry = local.get(bundle, ())
+
+                if entry is None or bundle in new_keys:
+                    # Repeated in the remote data, the first row wins
+                    continue
+
+                if entry:
+                    local[bundle] = None
+                    if entry[1] == hash(row):
+                        continue
+                    values, ready, waiting = (
+                        {"_id": entry[0], **dict(zip(names, row))},
+                        updated,
+                        deferred_updates,
+                    )
+                else:
+                    new_keys.add(bundle)
+                    values, ready, waiting = (
+                        dict(zip(names, row)),
+                        inserted,
+                        deferred_inserts,
+                    )
+
+                taken = any(
+                    owners.get((name, row[index]), bundle) != bundle
+                    for index, name in unique
+                    if row[index] is not None
+                )
+                (waiting if taken else ready).append(values)
+
+            write(updated, inserted)
+
+        deleted = [entry[0] for entry in local.values() if entry is not None]
+        for i in range(0, len(deleted), SQL_CHUNK):
+            connection.execute(
+                delete(table).where(table.c.id.in_(deleted[i : i + SQL_CHUNK]))
+            )
+        counts["deleted"] = len(deleted)
 
-        raw_url = file_data["download_url"]
+        # The bundles they take over are free now
+        write(deferred_updates, deferred_inserts)
 
-        return read_parquet(raw_url)
+    logger.info(
+        f"Synced {db_model.__tablename__} in {(perf_counter() - start) * 1000:.0f} ms: "
+        + ", ".join(f"{count} {name}" for name, count in counts.items())
+    )
 
-    except Timeout as e:
-        raise Timeout(f"Request timed out: {str(e)}") from e
-    except HTTPError as e:
-        raise HTTPError(f"GitHub API request failed: {str(e)}") from e
-    except RequestException as e:
-        raise RequestException(f"Request failed: {str(e)}") from e
-    except EmptyDataError as e:
-        raise EmptyDataError(f"Failed to read parquet file: {str(e)}") from e
+    return counts
 
 
-def update_sleeves() -> None:
+def update_sleeves() -> dict[str, int]:
     """
-    Updates the sleeves in the database by completely replacing all existing sleeves
-    with the latest data from the remote source.
+    Updates the sleeves in the database with the latest data from the remote source,
+    keeping the favorite and backup flags of the sleeves that are still present.
 
     This function:
     1. Fetches the latest sleeves data from the remote parquet file
-    2. Deletes all existing sleeves from the database
-    3. Adds all sleeves from the remote data
+    2. Inserts the new sleeves, updates the changed ones and deletes the removed ones,
+       in a single transaction
+
+    :return: The number of inserted, updated and deleted sleeves
     """
-    remote_sleeves = get_github_parquet_file("data/sleeves.parquet")
-    session.query(SleeveModel).delete()
-    session.add_all(
-        [
-            SleeveModel(
-                medium_bundle=sleeve["medium"],
-                small_bundle=sleeve["small"],
-            )
-            for _, sleeve in remote_sleeves.iterrows()
-            if not pd.isnull(sleeve["medium"]) and not pd.isnull(sleeve["small"])
-        ]
+    columns = {"medium": "medium_bundle", "small": "small_bundle"}
+    return _sync_table(
+        SleeveModel,
+        get_remote_batches(
+            "data/sleeves.parquet", list(columns), required=("medium", "small")
+        ),
+        columns,
     )
 
 
-def update_cards() -> None:
+def update_cards() -> dict[str, int]:
     """
-    Updates the cards in the database by completely replacing all existing cards
-    with the latest data from the remote source.
+    Updates the cards in the database with the latest data from the remote source,
+    keeping the favorite and backup flags of the cards that are still present.
 
     This function:
     1. Fetches the latest cards data from the remote parquet file
-    2. Deletes all existing cards from the database
-    3. Adds all cards from the remote data with their bundle, name, description, and data_index
+    2. Inserts the new cards, updates the ones whose name or bundles changed and
+       deletes the removed ones, in a single transaction
+
+    :return: The number of inserted, updated and deleted cards
     """
-    remote_cards = get_github_parquet_file("data/cards.parquet")
-    session.query(CardModel).delete()
-    session.add_all(
-        [
-            CardModel(
-                name=card["name"],
-                large_bundle=card["large"],
-                medium_bundle=card["medium"],
-                small_bundle=card["small"],
-            )
-            for _, card in remote_cards.iterrows()
-        ]
+    columns = {
+        "name": "name",
+        "large": "large_bundle",
+        "medium": "medium_bundle",
+        "small": "small_bundle",
+    }
+    counts = _sync_table(
+        CardModel, get_remote_batches("data/cards.parquet", list(columns)), columns
     )
 
+    if any(counts.values()):
+        CARD_NAME_INDEX.invalidate()
+
+    return counts
 
-def update_fields() -> None:
+
+def update_fields() -> dict[str, int]:
     """
-    Updates the fields in the database by completely replacing all existing fields
-    with the latest data from the remote source.
+    Updates the fields in the database with the latest data from the remote source,
+    keeping the favorite and backup flags of the fields that are still present.
 
     This function:
     1. Fetches the latest fields data from the remote parquet file
-    2. Deletes all existing fields from the database
-    3. Adds all fields from the remote data with their bundle, flipped, and bottom properties
+    2. Inserts the new fields, updates the changed ones and deletes the removed ones,
+       in a single transaction
+
+    :return: The number of inserted, updated and deleted fields
     """
-    remote_fields = get_github_parquet_file("data/fields.parquet")
-    session.query(FieldModel).delete()
-    session.add_all(
-        [
-            FieldModel(
-                medium_bundle=field["medium"],
-                small_bundle=field["small"],
-            )
-            for _, field in remote_fields.iterrows()
-            if not pd.isnull(field["medium"]) and not pd.isnull(field["small"])
-        ]
+    columns = {"medium": "medium_bundle", "small": "small_bundle"}
+    return _sync_table(
+        FieldModel,
+        get_remote_batches(
+            "data/fields.parquet", list(columns), required=("medium", "small")
+        ),
+        columns,
     )
@@ -0,0 +1,36 @@
+"""
+Shared setup of the tests.
+The app opens database.db and its caches relative to the working directory, so the
+tests run from a temporary one and never touch the user's data.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="floo-tests-"))
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    """Database of the tests, with the app config a first start would create."""
+    from database.objects import session
+    from util.constants import APP_CONFIG
+
+    # The config added on first start is only committed once a game path is chosen
+    if APP_CONFIG.game_path is None:
+        APP_CONFIG.game_path = ""
+        session.commit()
+
+    return session
@@ -0,0 +1,35 @@
+from PIL import Image
+
+import pages.models.sleeve_list_model as sleeve_list_model
+from database.models import SleeveModel
+from database.objects import DBsession, session
+from pages.models.sleeve_list_model import SleeveListModel
+
+
+def test_thumbnail_refresh_after_backup_state_change(qt_app, app_db, monkeypatch):
+    # A successful replacement marks the sleeve as backed up through the GUI session,
+    # then makes its thumbnail again, which stores its new color statistics
+    sleeve = SleeveModel(small_bundle="s_regr", medium_bundle="m_regr")
+    session.add(sleeve)
+    session.commit()
+
+    texture = [Image.new("RGBA", (512, 724), (200, 30, 30, 255))]
+    monkeypatch.setattr(
+        sleeve_list_model, "fetch_bundle_image", lambda bundle, *_: texture[0]
+    )
+    model = SleeveListModel()
+    sleeve = next(asset for asset in model.assets if asset.medium_bundle == "m_regr")
+
+    texture[0] = Image.new("RGBA", (512, 724), (30, 30, 200, 255))
+    model.set_backup_state(sleeve.id, True)
+    model.refresh_thumbnail(sleeve)
+
+    db_session = DBsession()
+    try:
+        stored = db_session.get(SleeveModel, sleeve.id)
+        assert stored.has_backup
+        assert stored.color_digest is not None
+        assert stored.color_digest == sleeve.color_digest
+        assert stored.dominant_color == sleeve.dominant_color
+    finally:
+        db_session.close()
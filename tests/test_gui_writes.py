@@ -0,0 +1,22 @@
+from database.models import SleeveModel
+from database.objects import session_scope
+from pages.models.sleeve_list_model import SleeveListModel
+
+
+def test_backup_state_writes_release_the_lock(qt_app, app_db):
+    # Background writers use their own connection, the GUI session must not keep the
+    # write lock once its backup flag writes return
+    with session_scope() as db_session:
+        db_session.add(SleeveModel(small_bundle="s_lock", medium_bundle="m_lock"))
+
+    model = SleeveListModel()
+    sleeve_id = app_db.query(SleeveModel.id).filter_by(medium_bundle="m_lock").scalar()
+
+    model.set_backup_state(sleeve_id, True)
+    with session_scope() as db_session:
+        db_session.get(SleeveModel, sleeve_id).favorite = True
+
+    model.reset_backups()
+    with session_scope() as db_session:
+        stored = db_session.get(SleeveModel, sleeve_id)
+        assert stored.favorite and not stored.has_backup
@@ -0,0 +1,31 @@
+import services.texture_index_service as texture_index_service
+from util.constants import APP_CONFIG
+
+
+class FakeUnityPy:
+    """Bundles without any Texture2D, one of them failing to load."""
+
+    loaded = []
+
+    @classmethod
+    def load(cls, path):
+        cls.loaded.append(path)
+        if path.endswith("broken"):
+            raise ValueError("not a bundle")
+        return type("Environment", (), {"objects": []})()
+
+
+def test_bundles_without_textures_are_not_opened_again(app_db, tmp_path, monkeypatch):
+    folder = tmp_path / "ab"
+    folder.mkdir()
+    (folder / "empty").write_bytes(b"")
+    (folder / "broken").write_bytes(b"")
+
+    monkeypatch.setattr(APP_CONFIG, "game_path", str(tmp_path))
+    monkeypatch.setattr(texture_index_service, "UnityPy", FakeUnityPy)
+
+    assert texture_index_service.index_textures() == 2
+    assert len(FakeUnityPy.loaded) == 2
+
+    assert texture_index_service.index_textures() == 0
+    assert len(FakeUnityPy.loaded) == 2
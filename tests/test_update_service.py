@@ -0,0 +1,57 @@
+import pyarrow as pa
+from sqlalchemy import delete, select
+
+from database.models import SleeveModel
+from database.objects import session_scope
+from services.update_service import _sync_table
+
+COLUMNS = {"medium": "medium_bundle", "small": "small_bundle"}
+
+
+def batch(*rows: tuple[str, str]) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pydict(
+        {"medium": [row[0] for row in rows], "small": [row[1] for row in rows]}
+    )
+
+
+def test_sync_streams_batches_against_local_rows(app_db):
+    with session_scope() as db_session:
+        db_session.execute(delete(SleeveModel))
+        db_session.add_all(
+            [
+                SleeveModel(medium_bundle="m1", small_bundle="s1", favorite=True),
+                SleeveModel(medium_bundle="m2", small_bundle="s2"),
+                SleeveModel(medium_bundle="m3", small_bundle="s3"),
+            ]
+        )
+
+    counts = _sync_table(
+        SleeveModel,
+        [
+            # m4 takes over the small bundle of m3, which is only deleted at the end
+            batch(("m1", "s1"), ("m4", "s3")),
+            batch(("m2", "s9"), ("m5", "s5"), ("m5", "s6")),
+        ],
+        COLUMNS,
+    )
+
+    assert counts == {"inserted": 2, "updated": 1, "deleted": 1}
+
+    with session_scope() as db_session:
+        rows = {
+            medium: (small, favorite)
+            for medium, small, favorite in db_session.execute(
+                select(
+                    SleeveModel.medium_bundle,
+                    SleeveModel.small_bundle,
+                    SleeveModel.favorite,
+                )
+            )
+        }
+
+    assert rows == {
+        "m1": ("s1", True),
+        "m2": ("s9", False),
+        "m4": ("s3", False),
+        "m5": ("s5", False),
+    }
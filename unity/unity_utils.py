@@ -5,14 +5,16 @@ from shutil import copyfile
 from PIL import Image
 from PIL.ImageQt import ImageQt
 from PySide6 import QtGui
-from UnityPy import load as unity_load
-from UnityPy.enums import TextureFormat
 from sqlalchemy.orm import Mapped
 
 from database.models import FieldModel
 from util.constants import FILE, APP_CONFIG
 from util.enums import FieldCoordinates
-from util.image_utils import slugify, convert_to_png
+from util.image_utils import slugify, to_texture_image
+from util.lazy_import import lazy_import
+
+# Only needed when reading or writing bundles, so kept out of the startup
+UnityPy = lazy_import("UnityPy")
 
 
 def prepare_environment(miss: bool, bundle: str) -> str:
@@ -46,7 +48,7 @@ def fetch_unity3d_image(path_id: int, aspect: tuple) -> QtGui.QIcon | None:
     :return: The resized and converted RGB image from Unity3D resources.
     :rtype: Image.Image
     """
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
+    env = UnityPy.load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
 
     for obj in env.objects:
         if obj.type.name == "Texture2D" and str(obj.path_id) == path_id:
@@ -75,7 +77,7 @@ def batch_fetch_unity3d_images(path_ids: list[int], aspect: tuple) -> dict[QtGui
     :return: The resized and converted RGB images from Unity3D resources.
     :rtype: QtGui.QIcon
     """
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
+    env = UnityPy.load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
 
     images: dict[QtGui.QIcon] = {}
 
@@ -108,7 +110,7 @@ def replace_unity3d_asset(asset: str, img: Image.Image, by_path_id=False) -> Non
     :type by_path_id: bool, optional
     """
 
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
+    env = UnityPy.load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
 
     for obj in env.objects:
         if obj.type.name == "Texture2D":
@@ -117,8 +119,8 @@ def replace_unity3d_asset(asset: str, img: Image.Image, by_path_id=False) -> Non
                 data.m_Width, data.m_Height = img.size
 
                 data.set_image(
-                    img=convert_to_png(img),
-                    target_format=TextureFormat.RGBA32,
+                    img=to_texture_image(img),
+                    target_format=UnityPy.enums.TextureFormat.RGBA32,
                 )
 
                 data.save()
@@ -158,7 +160,7 @@ def extract_unity3d_image(asset: str, by_id=False, backup=False) -> None:
     in the current working directory or else this function will raise an IOError.
 
     """
-    for obj in unity_load(
+    for obj in UnityPy.load(
         join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"])
     ).objects:
         if obj.type.name == "Texture2D":
@@ -192,7 +194,7 @@ def fetch_home_bg():
     :rtype: QtGui.QIcon
     """
 
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
+    env = UnityPy.load(join(APP_CONFIG.game_path[:-18], "dlpc_Data", FILE["UNITY"]))
     for obj in env.objects:
         if obj.type.name == "Texture2D":
             data = obj.read()
@@ -217,6 +219,27 @@ def swap_bundles(bundles: list) -> None:
     remove(join(APP_CONFIG.game_path, bundles[0]))
 
 
+def fetch_bundle_image(
+    bundle: str | Mapped[str], unity_file=False
+) -> Image.Image | None:
+    """
+    Fetches the texture image of a Unity3D bundle.
+
+    :param bundle: The bundle to fetch the image from.
+    :type bundle: str | Mapped[str]
+    :param unity_file: Whether to use the Unity3D file.
+    :type unity_file: bool, optional
+    :returns: The texture image of the bundle.
+    :rtype: Image.Image | None
+    """
+
+    env = UnityPy.load(prepare_environment(unity_file, bundle))
+
+    for obj in env.objects:
+        if obj.type.name == "Texture2D":
+            return obj.read().image
+
+
 def fetch_bundle_thumb(
     bundle: str | Mapped[str],
     ratio: tuple[int, int] | None,
@@ -241,26 +264,36 @@ def fetch_bundle_thumb(
     :rtype: QtGui.QIcon | None
     """
 
-    env = unity_load(prepare_environment(unity_file, bundle))
+    img = fetch_bundle_image(bundle, unity_file)
 
-    for obj in env.objects:
-        if obj.type.name == "Texture2D":
-            data = obj.read()
+    if img is None:
+        return None
 
-            img = data.image
+    if crop_coordinates:
+        img = img.crop(crop_coordinates)
 
-            if crop_coordinates:
-                img = img.crop(crop_coordinates)
+    if ratio:
+        img = img.resize(ratio)
 
-            if ratio:
-                img = img.resize(ratio)
+    return image_to_icon(img)
 
-            img.name = FILE["IMAGE_NAME"]
 
-            icon = QtGui.QIcon()
-            icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+def image_to_icon(img: Image.Image) -> QtGui.QIcon:
+    """
+    Converts an image into an icon usable by the list models.
 
-            return icon
+    :param img: The image to convert.
+    :type img: Image.Image
+    :returns: A QIcon object representing the image.
+    :rtype: QtGui.QIcon
+    """
+
+    img.name = FILE["IMAGE_NAME"]
+
+    icon = QtGui.QIcon()
+    icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+
+    return icon
 
 
 def fetch_field_thumb(field: FieldModel) -> QtGui.QIcon | None:
@@ -276,7 +309,7 @@ def fetch_field_thumb(field: FieldModel) -> QtGui.QIcon | None:
     :rtype: QtGui.QIcon | None
     """
 
-    env = unity_load(prepare_environment(False, field.bundle))
+    env = UnityPy.load(prepare_environment(False, field.bundle))
 
     for obj in env.objects:
         if obj.type.name == "Texture2D":
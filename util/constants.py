@@ -7,6 +7,7 @@ and global state to facilitate updates and maintain consistency.
 from database.migrations import run_migrations
 from database.models import AppConfig
 from database.objects import session
+from util.startup_profiler import STARTUP_PROFILER
 
 # File-related constants
 FILE: dict[str, str | list[str]] = {
@@ -75,7 +76,8 @@ DATA_URL: str = (
 """
 
 # Check for migrations before getting app config data
-run_migrations()
+with STARTUP_PROFILER.phase("run_migrations"):
+    run_migrations()
 
 # Global application configuration from database
 APP_CONFIG: AppConfig = session.query(AppConfig).first()
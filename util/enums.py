@@ -26,3 +26,37 @@ class IconSize(Enum):
     SMALL = 128
     MEDIUM = 256
     BIG = 512
+
+
+class ColorFamily(Enum):
+    """
+    Color families used to filter assets, twelve 30 degree hue ranges starting from red
+    followed by the achromatic ones.
+    """
+
+    RED = 0
+    ORANGE = 1
+    YELLOW = 2
+    LIME = 3
+    GREEN = 4
+    TEAL = 5
+    CYAN = 6
+    AZURE = 7
+    BLUE = 8
+    VIOLET = 9
+    MAGENTA = 10
+    PINK = 11
+    BLACK = 12
+    GRAY = 13
+    WHITE = 14
+
+
+class JobStage(Enum):
+    """
+    Stages of the background asset jobs, in the order they run. A job can only be
+    cancelled before it starts writing.
+    """
+
+    LOADING = "Loading"
+    ENCODING = "Encoding"
+    WRITING = "Writing"
@@ -0,0 +1,217 @@
+"""
+Decode-once image processing pipeline.
+This module turns a user given image file into the textures written to the bundles
+through a fixed chain of stages (decode -> orientation/ratio fit -> border/fade ->
+per-target resize). Every intermediate result is memoised by the hash of the source
+file and the parameters of the stages that produced it, so previewing and then
+replacing, or replacing several sizes of the same asset, reuse the work already done.
+Multiple target sizes are produced from one shared resolution pyramid, and JPEG
+sources are decoded at a reduced scale when only small targets are needed.
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+from os import stat
+from threading import Lock
+
+from PIL import Image, ImageOps
+
+from util.image_utils import (
+    add_sleeve_border,
+    add_sleeve_border_with_fade,
+    build_resolution_pyramid,
+    change_image_ratio,
+)
+
+
+class ImagePipeline:
+    """
+    Memoising image pipeline keyed by source hash and stage parameters.
+
+    Cached images are shared between callers, so they must be copied before being
+    modified in place (`Image.paste`, `Image.putalpha`, ...).
+
+    Attributes:
+        max_bytes: Approximate memory budget for the cached images, the least recently
+                   used stages are evicted once it is exceeded
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._stages: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._sources: dict[tuple[str, int, int], tuple[str, str | None]] = {}
+        self._size = 0
+        self._lock = Lock()
+
+    def source_hash(self, path: str) -> str:
+        """
+        Returns the content hash of the given file, only re-reading it when its
+        modification time or size change.
+
+        :param path: Path to the source image
+        :return: Hex digest of the file content
+        """
+        return self._source_info(path)[0]
+
+    def process(
+        self,
+        path: str,
+        ratio: tuple[int, int] | None = None,
+        border: str | None = None,
+        fade: bool = False,
+        size: tuple[int, int] | None = None,
+    ) -> Image.Image:
+        """
+        Runs the given image through the pipeline, reusing every cached stage.
+
+        :param path: Path to the source image
+        :param ratio: Aspect ratio to center crop the image to, None to keep it
+        :param border: Border color to add around the image, None for no border
+        :param fade: Whether the border fades into the image content
+        :param size: Final size of the image (width, height), None to keep it
+        :return: The processed RGBA image, shared with the cache
+        """
+        if size:
+            return self.process_sizes(path, [size], ratio, border, fade)[tuple(size)]
+
+        return self._run(path, self._base_key(path, ratio, border, fade, None))
+
+    def process_sizes(
+        self,
+        path: str,
+        sizes: list[tuple[int, int]],
+        ratio: tuple[int, int] | None = None,
+        border: str | None = None,
+        fade: bool = False,
+    ) -> dict[tuple[int, int], Image.Image]:
+        """
+        Runs the given image through the pipeline for several target sizes at once,
+        building the missing sizes from a single resolution pyramid.
+
+        :param path: Path to the source image
+        :param sizes: Final sizes of the image (width, height)
+        :param ratio: Aspect ratio to center crop the image to, None to keep it
+        :param border: Border color to add around the image, None for no border
+        :param fade: Whether the border fades into the image content
+        :return: The processed RGBA images by target size, shared with the cache
+        """
+        sizes = [tuple(size) for size in sizes]
+
+        # JPEG sources can be decoded directly at a fraction of their resolution, as
+        # long as it stays at least twice as big as every target
+        draft = None
+        if not ratio and self._source_info(path)[1] == "JPEG":
+            draft = (max(s[0] for s in sizes) * 2, max(s[1] for s in sizes) * 2)
+
+        base_key = self._base_key(path, ratio, border, fade, draft)
+        resized: dict[tuple[int, int], Image.Image] = {}
+
+        with self._lock:
+            for size in sizes:
+                cached = self._stages.get(base_key + (("resize", size),))
+                if cached is not None:
+                    resized[size] = cached
+
+        missing = [size for size in sizes if size not in resized]
+
+        if missing:
+            pyramid = build_resolution_pyramid(self._run(path, base_key), missing)
+            for size, img in pyramid.items():
+                self._store(base_key + (("resize", size),), img)
+            resized.update(pyramid)
+
+        return resized
+
+    def clear(self) -> None:
+        """Drops every cached stage."""
+        with self._lock:
+            self._stages.clear()
+            self._sources.clear()
+            self._size = 0
+
+    def _source_info(self, path: str) -> tuple[str, str | None]:
+        info = stat(path)
+        file_key = (path, info.st_mtime_ns, info.st_size)
+
+        source = self._sources.get(file_key)
+        if source is None:
+            hasher = blake2b(digest_size=16)
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            with Image.open(path) as img:
+                source = (hasher.hexdigest(), img.format)
+            self._sources[file_key] = source
+
+        return source
+
+    def _base_key(
+        self,
+        path: str,
+        ratio: tuple[int, int] | None,
+        border: str | None,
+        fade: bool,
+        draft: tuple[int, int] | None,
+    ) -> tuple:
+        stages: list[tuple] = [("decode", self.source_hash(path), draft)]
+
+        if ratio:
+            stages.append(("fit", tuple(ratio)))
+        if border:
+            stages.append(("border", border, bool(fade)))
+
+        return tuple(stages)
+
+    def _run(self, path: str, key: tuple) -> Image.Image:
+        with self._lock:
+            cached = self._stages.get(key)
+            if cached is not None:
+                self._stages.move_to_end(key)
+                return cached
+
+        if len(key) == 1:
+            draft = key[0][2]
+            with Image.open(path) as source:
+                if draft:
+                    source.draft(source.mode, draft)
+                img = ImageOps.exif_transpose(source).convert("RGBA")
+        else:
+            img = self._apply(self._run(path, key[:-1]), key[-1])
+
+        self._store(key, img)
+
+        return img
+
+    @staticmethod
+    def _apply(img: Image.Image, stage: tuple) -> Image.Image:
+        name, *params = stage
+
+        if name == "fit":
+            return change_image_ratio(img, params[0])
+        if name == "border":
+            color, fade = params
+            if fade:
+                return add_sleeve_border_with_fade(img, color)
+            return add_sleeve_border(img, color)
+        if name == "resize":
+            return build_resolution_pyramid(img, [params[0]])[params[0]]
+
+        raise ValueError(f"Unknown pipeline stage: {name}")
+
+    def _store(self, key: tuple, img: Image.Image) -> None:
+        img_size = img.width * img.height * len(img.getbands())
+
+        with self._lock:
+            if key in self._stages:
+                return
+
+            self._stages[key] = img
+            self._size += img_size
+
+            while self._size > self.max_bytes and len(self._stages) > 1:
+                _, evicted = self._stages.popitem(last=False)
+                self._size -= evicted.width * evicted.height * len(evicted.getbands())
+
+
+# Global pipeline shared by the services and the previews
+IMAGE_PIPELINE: ImagePipeline = ImagePipeline()
@@ -1,7 +1,5 @@
-import io
-
 from unicodedata import normalize
-from PIL import Image, ImageChops, ImageOps, ImageDraw
+from PIL import Image, ImageChops, ImageColor, ImageOps, ImageDraw
 from re import sub
 
 import numpy as np
@@ -22,97 +20,136 @@ def add_sleeve_border_with_fade(image: Image.Image, color: str) -> Image.Image:
     border_width = int(image.width * 0.05)
     border_height = int(image.height * 0.04)
 
-    # Create new image with border space
-    new_width = image.width + 2 * border_width
-    new_height = image.height + 2 * border_height
-
-    # Parse color
-    original_color = color
-    if color.startswith("#"):
-        color = color[1:]
-    r = int(color[0:2], 16)
-    g = int(color[2:4], 16)
-    b = int(color[4:6], 16)
-
     # Convert original image to RGBA if needed
     if image.mode != "RGBA":
         image = image.convert("RGBA")
 
-    # First, expand the image with the border color (like the solid border)
-    result = ImageOps.expand(
-        image, border=(border_width, border_height), fill=original_color
+    # First, expand the image with the border color (like the solid border), the outer
+    # edges stay solid and only the content area is blended below
+    result = ImageOps.expand(image, border=(border_width, border_height), fill=color)
+
+    # Fade distance for inner transition
+    fade_distance = min(border_width, border_height) * 2.0
+
+    if fade_distance <= 0:
+        return result
+
+    # Distance of every content pixel to the nearest content edge, built from the
+    # per-row and per-column distances instead of visiting each pixel
+    rows = np.arange(image.height)
+    cols = np.arange(image.width)
+    dist_to_border = np.minimum(
+        np.minimum(rows, image.height - 1 - rows)[:, None],
+        np.minimum(cols, image.width - 1 - cols)[None, :],
     )
 
-    # Convert to numpy arrays for gradient processing
-    result_array = np.array(result).astype(np.float32)
-    original_array = np.array(image).astype(np.float32)
-
-    # Create fade effect that only extends inward into the image content
-    fade_distance = (
-        min(border_width, border_height) * 2.0
-    )  # Fade distance for inner transition
-
-    # Process each pixel to create the gradient blend
-    for y in range(new_height):
-        for x in range(new_width):
-            # Get original image coordinates
-            orig_x = x - border_width
-            orig_y = y - border_height
-
-            # Check if we're in the original image area
-            if 0 <= orig_x < image.width and 0 <= orig_y < image.height:
-                # We're in the image content area - apply fade based on distance to border
-
-                # Calculate distance to the border (content boundary)
-                dist_to_border_left = orig_x
-                dist_to_border_right = image.width - 1 - orig_x
-                dist_to_border_top = orig_y
-                dist_to_border_bottom = image.height - 1 - orig_y
-
-                # Find minimum distance to any border edge
-                min_border_dist = min(
-                    dist_to_border_left,
-                    dist_to_border_right,
-                    dist_to_border_top,
-                    dist_to_border_bottom,
-                )
-
-                # Only apply fade if we're close to the border
-                if min_border_dist < fade_distance:
-                    # Calculate fade factor based on distance from border
-                    base_fade_factor = min_border_dist / fade_distance
-
-                    # Apply double smoothstep for ultra-soft transition
-                    smooth1 = (
-                        base_fade_factor
-                        * base_fade_factor
-                        * (3.0 - 2.0 * base_fade_factor)
-                    )
-                    smooth2 = smooth1 * smooth1 * (3.0 - 2.0 * smooth1)
-
-                    # Exponential softening
-                    fade_factor = 1.0 - np.exp(-4.0 * smooth2)
-
-                    # Blend between border color and original image
-                    original_pixel = original_array[orig_y, orig_x]
-                    border_color = np.array([r, g, b, 255], dtype=np.float32)
-
-                    # Smooth interpolation - fade_factor 0 = border color, 1 = original image
-                    blended_pixel = (
-                        1 - fade_factor
-                    ) * border_color + fade_factor * original_pixel
-                    result_array[y, x] = blended_pixel
-                else:
-                    # Far from border - keep original image
-                    result_array[y, x] = original_array[orig_y, orig_x]
-            else:
-                # Outside original image bounds - solid border color (no fade on outer edges)
-                result_array[y, x] = [r, g, b, 255]
+    # Only pixels close to the border are blended, the rest keep the original image
+    fade_rows, fade_cols = np.nonzero(dist_to_border < fade_distance)
+
+    # Apply double smoothstep for ultra-soft transition, then exponential softening
+    base_fade_factor = dist_to_border[fade_rows, fade_cols] / fade_distance
+    smooth1 = base_fade_factor * base_fade_factor * (3.0 - 2.0 * base_fade_factor)
+    smooth2 = smooth1 * smooth1 * (3.0 - 2.0 * smooth1)
+    fade_factor = (1.0 - np.exp(-4.0 * smooth2))[:, None]
+
+    # Smooth interpolation - fade_factor 0 = border color, 1 = original image
+    r, g, b = ImageColor.getrgb(color)[:3]
+    border_color = np.array([r, g, b, 255], dtype=np.float32)
+    original_pixels = np.asarray(image)[fade_rows, fade_cols].astype(np.float32)
+    blended_pixels = (1 - fade_factor) * border_color + fade_factor * original_pixels
+
+    result_array = np.array(result)
+    result_array[fade_rows + border_height, fade_cols + border_width] = (
+        blended_pixels.astype(np.float32).astype(np.uint8)
+    )
 
     # Convert back to PIL Image
-    result = Image.fromarray(result_array.astype(np.uint8), "RGBA")
+    return Image.fromarray(result_array, "RGBA")
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Computes the difference hash of an image, robust to scaling and small color changes.
+
+    :param image: Image to be hashed
+    :param hash_size: Side of the hash grid, the hash has hash_size ** 2 bits
+    :return: The hash as an unsigned integer
+    """
+
+    pixels = np.asarray(
+        image.convert("L").resize(
+            (hash_size + 1, hash_size), Image.Resampling.BILINEAR
+        ),
+        dtype=np.int16,
+    )
+
+    return int.from_bytes(np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes(), "big")
+
+
+def phash(image: Image.Image, hash_size: int = 8, highfreq_factor: int = 4) -> int:
+    """
+    Computes the perceptual hash of an image from the low frequencies of its DCT.
+
+    :param image: Image to be hashed
+    :param hash_size: Side of the hash grid, the hash has hash_size ** 2 bits
+    :param highfreq_factor: How much bigger than the hash grid the DCT input is
+    :return: The hash as an unsigned integer
+    """
+
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(
+        image.convert("L").resize((size, size), Image.Resampling.LANCZOS),
+        dtype=np.float64,
+    )
+
+    # Type II DCT over both axes, as a matrix product
+    n = np.arange(size)
+    dct = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    low_frequencies = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+
+    return int.from_bytes(
+        np.packbits(low_frequencies > np.median(low_frequencies)).tobytes(), "big"
+    )
+
 
-    return result
+def color_statistics(image: Image.Image) -> tuple[str, int, float, bytes]:
+    """
+    Computes the color statistics of an image, ignoring fully transparent pixels.
+
+    The histogram has one bin per `ColorFamily`: pixels that are too dark or too
+    desaturated count as black, gray or white, the rest by their hue.
+
+    :param image: Image to be analysed, usually an asset thumbnail
+    :return: The dominant color as a hex string, its color family value, the mean
+             luminance (0 to 1) and the histogram as one byte per color family
+             (fraction of the pixels * 255)
+    """
+
+    rgb_image = image.convert("RGB")
+    rgb = np.asarray(rgb_image, dtype=np.float32).reshape(-1, 3)
+    hue, saturation, value = (
+        np.asarray(rgb_image.convert("HSV")).reshape(-1, 3).astype(np.int32).T
+    )
+
+    families = (hue * 12 + 128) // 256 % 12
+    families = np.where(saturation < 48, np.where(value > 200, 14, 13), families)
+    families = np.where(value < 48, 12, families)
+
+    if "A" in image.getbands():
+        visible = np.asarray(image.getchannel("A")).reshape(-1) > 0
+        if visible.any():
+            rgb, families = rgb[visible], families[visible]
+
+    histogram = np.bincount(families, minlength=15) / len(families)
+    family = int(histogram.argmax())
+    dominant = rgb[families == family].mean(axis=0)
+
+    return (
+        "#{:02x}{:02x}{:02x}".format(*dominant.round().astype(int)),
+        family,
+        float((rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).mean() / 255),
+        (histogram * 255).round().astype(np.uint8).tobytes(),
+    )
 
 
 def trim(im) -> Image.Image:
@@ -150,6 +187,38 @@ def resize_image(path: str, size: tuple[int, int]) -> Image.Image:
     return Image.open(path).convert("RGBA").resize(size, Image.Resampling.LANCZOS)
 
 
+def build_resolution_pyramid(
+    image: Image.Image, sizes: list[tuple[int, int]]
+) -> dict[tuple[int, int], Image.Image]:
+    """
+    Resizes an image to several target sizes through a single shared reduction chain.
+
+    The targets are handled from largest to smallest, each one box-reducing the previous
+    level by whole factors while it stays at least twice the target size, and then
+    finishing with a lanczos resize, so every size is derived from the smallest
+    intermediate that still holds enough detail for it.
+
+    :param image: Image to be resized
+    :param sizes: Target sizes (width, height)
+    :return: The resized images by target size
+    """
+
+    resized: dict[tuple[int, int], Image.Image] = {}
+    level = image
+
+    for size in sorted(set(sizes), key=lambda s: s[0] * s[1], reverse=True):
+        factor = max(
+            min(level.width // (size[0] * 2), level.height // (size[1] * 2)), 1
+        )
+
+        if factor > 1:
+            level = level.reduce(factor)
+
+        resized[size] = level.resize(size, Image.Resampling.LANCZOS)
+
+    return resized
+
+
 def convert_image(path: str) -> Image.Image:
     """Converts the user given image to its proper size using lanczos resampling"""
 
@@ -219,13 +288,23 @@ def overlay_images(
     return image1
 
 
-def convert_to_png(img: Image.Image) -> Image.Image:
-    png_image_buffer = io.BytesIO()
-    img.save(png_image_buffer, format="PNG")
-    png_image = Image.open(png_image_buffer)
-    png_image_buffer.seek(0)
+def to_texture_image(img: Image.Image) -> Image.Image:
+    """
+    Normalises an image in memory so it can be handed directly to the texture encoder.
+
+    The result is a fully loaded RGBA image, palette transparency and premultiplied or
+    partial alpha modes are converted, and images without alpha get an opaque channel.
+
+    :param img: Image to be normalised
+    :return: The RGBA image, the given one if it already was
+    """
 
-    return png_image
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+
+    img.load()
+
+    return img
 
 
 def paste_scaled_image(bg_image, fg_image, bounding_box) -> Image.Image:
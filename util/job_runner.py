@@ -0,0 +1,178 @@
+"""
+Background asset jobs for the pages.
+Replacing, extracting and copying bundles means loading, encoding and writing textures,
+which takes seconds for the larger ones, so the pages submit them here instead of running
+them on the GUI thread. Jobs report their stage as they go and can be cancelled until
+they start writing, so a cancelled job never leaves a bundle half written.
+"""
+
+import logging
+from queue import Queue
+from threading import Lock, Thread
+from typing import Callable
+
+from PySide6.QtCore import QObject, Signal
+
+from util.enums import JobStage
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised in a job cancelled before its writing stage."""
+
+
+class Job:
+    """
+    Progress of a job, handed to its work function.
+
+    Attributes:
+        title: What the job does, shown by the progress dialog
+        on_done: Called on the GUI thread with the result of the work
+        on_cancelled: Called on the GUI thread if the job was cancelled
+        on_failed: Called on the GUI thread with the error that stopped the job
+    """
+
+    def __init__(
+        self,
+        title: str = "",
+        on_done: Callable[[object], None] | None = None,
+        on_cancelled: Callable[[], None] | None = None,
+        on_failed: Callable[[Exception], None] | None = None,
+        on_stage: Callable[["Job", JobStage, str], None] | None = None,
+    ):
+        self.title = title
+        self.on_done = on_done
+        self.on_cancelled = on_cancelled
+        self.on_failed = on_failed
+        self._on_stage = on_stage
+        self._lock = Lock()
+        self._cancelled = False
+        self._writing = False
+
+    def stage(self, stage: JobStage, detail: str = "") -> None:
+        """
+        Reports the stage the job is entering, the work must call it before each of them.
+
+        :param stage: Stage the job is entering
+        :param detail: What the stage works on, a bundle name for instance
+        :raises JobCancelled: If the job was cancelled before writing
+        """
+        with self._lock:
+            if self._cancelled and not self._writing:
+                raise JobCancelled()
+            if stage == JobStage.WRITING:
+                self._writing = True
+
+        if self._on_stage:
+            self._on_stage(self, stage, detail)
+
+    def cancel(self) -> bool:
+        """
+        Asks the job to stop at its next stage.
+
+        :return: Whether the job will stop, it won't once it started writing
+        """
+        with self._lock:
+            if not self._writing:
+                self._cancelled = True
+            return self._cancelled
+
+    @property
+    def cancellable(self) -> bool:
+        """Whether the job can still be cancelled."""
+        return not self._writing
+
+
+class JobRunner(QObject):
+    """
+    Runs the jobs of a page one after the other on a worker thread, so two jobs never
+    write the same bundle at once.
+
+    Signals:
+        started: Emitted on the GUI thread with the job starting
+        stage_changed: Emitted on the GUI thread with the job, its stage and the detail
+        ended: Emitted on the GUI thread with the job once it is done, cancelled or failed
+    """
+
+    started = Signal(object)
+    stage_changed = Signal(object, object, str)
+    ended = Signal(object)
+    _finished = Signal(object, object, object)
+
+    def __init__(self):
+        super().__init__()
+        self._jobs: Queue[tuple[Job, Callable[[Job], object]]] = Queue()
+        self.current: Job | None = None
+
+        self._finished.connect(self._deliver)
+
+        Thread(target=self._work, daemon=True).start()
+
+    def submit(
+        self,
+        title: str,
+        work: Callable[[Job], object],
+        on_done: Callable[[object], None] | None = None,
+        on_cancelled: Callable[[], None] | None = None,
+        on_failed: Callable[[Exception], None] | None = None,
+    ) -> Job:
+        """
+        Queues a job, the callbacks are called on the GUI thread once it ended.
+
+        :param title: What the job does, shown by the progress dialog
+        :param work: Called on the worker thread with the job, returns the result
+        :param on_done: Called with the result of the work
+        :param on_cancelled: Called if the job was cancelled
+        :param on_failed: Called with the error that stopped the job
+        :return: The job, to cancel it
+        """
+        job = Job(
+            title,
+            on_done,
+            on_cancelled,
+            on_failed,
+            lambda job, stage, detail: self.stage_changed.emit(job, stage, detail),
+        )
+        self._jobs.put((job, work))
+
+        return job
+
+    def cancel(self) -> bool:
+        """
+        Cancels the running job, if it didn't start writing yet.
+
+        :return: Whether the job will stop
+        """
+        job = self.current
+        return job is not None and job.cancel()
+
+    def _work(self) -> None:
+        while True:
+            job, work = self._jobs.get()
+            self.current = job
+            self.started.emit(job)
+
+            result = error = None
+            try:
+                result = work(job)
+            except JobCancelled as e:
+                error = e
+            except Exception as e:
+                logger.error(f"{job.title} failed: {e}")
+                error = e
+
+            self.current = None
+            self._finished.emit(job, result, error)
+
+    def _deliver(self, job: Job, result, error) -> None:
+        self.ended.emit(job)
+
+        if isinstance(error, JobCancelled):
+            if job.on_cancelled:
+                job.on_cancelled()
+        elif error is not None:
+            if job.on_failed:
+                job.on_failed(error)
+        elif job.on_done:
+            job.on_done(result)
@@ -0,0 +1,50 @@
+"""
+Deferred imports.
+Heavy dependencies (UnityPy, pyarrow, requests...) are only needed once the user does
+something with them, so the modules using them bind a stand-in at import time and the real
+module is imported on first attribute access, keeping their cost out of the cold start.
+"""
+
+from importlib import import_module
+from threading import Lock
+from types import ModuleType
+
+
+class LazyModule:
+    """
+    Stand-in for a module, importing it on first attribute access.
+
+    Attributes:
+        name: Fully qualified name of the module
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._module: ModuleType | None = None
+        self._lock = Lock()
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self.name}' ({state})>"
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = import_module(self.name)
+        return self._module
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Returns a stand-in for the given module, imported the first time it is used.
+
+    Annotations using the module must be quoted, or they import it when evaluated.
+
+    :param name: Fully qualified name of the module, submodules included
+    :return: The module stand-in
+    """
+    return LazyModule(name)
@@ -0,0 +1,147 @@
+"""
+Background preview rendering for the asset pages.
+This module renders what a replacement will look like (sleeve borders and fades, card
+art pasted on its frame) on a downscaled proxy of the user image, away from the GUI
+thread. Only the latest request is ever rendered, older ones are dropped as soon as a
+newer one arrives and stale results are never shown.
+"""
+
+import logging
+from threading import Condition, Thread
+from typing import Callable
+
+from PIL import Image
+from PIL.ImageQt import ImageQt
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QPixmap
+
+from util.enums import CardArtCoordinates
+from util.image_pipeline import IMAGE_PIPELINE
+from util.image_utils import add_sleeve_border, add_sleeve_border_with_fade
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewRenderer(QObject):
+    """
+    Renders previews on a worker thread, keeping only the most recent request.
+
+    Signals:
+        ready: Emitted on the GUI thread with the pixmap of the latest finished render
+    """
+
+    ready = Signal(QPixmap)
+    _finished = Signal(int, object)
+
+    def __init__(self):
+        super().__init__()
+        self._condition = Condition()
+        self._pending: tuple[int, Callable[[], Image.Image]] | None = None
+        self._generation = 0
+
+        self._finished.connect(self._deliver)
+
+        Thread(target=self._work, daemon=True).start()
+
+    def request(self, render: Callable[[], Image.Image]) -> None:
+        """
+        Schedules a render, replacing any request that has not started yet.
+
+        :param render: Callable returning the preview image, run on the worker thread
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, render)
+            self._condition.notify()
+
+    def cancel(self) -> None:
+        """Drops the pending request and discards the result of the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, render = self._pending
+                self._pending = None
+
+            try:
+                image = ImageQt(render())
+            except Exception as e:
+                logger.error(f"Preview render failed: {e}")
+                continue
+
+            if generation == self._generation:
+                self._finished.emit(generation, image)
+
+    def _deliver(self, generation: int, image) -> None:
+        # Checked again on the GUI thread, a newer request may have arrived meanwhile
+        if generation == self._generation:
+            self.ready.emit(QPixmap.fromImage(image))
+
+
+def render_proxy(path: str, limit: int = 374) -> Image.Image:
+    """
+    Renders the user image scaled down to fit within the limit, cached by the pipeline.
+
+    :param path: Path to the user image
+    :param limit: Largest side of the proxy image, in pixels
+    :return: The proxy image
+    """
+
+    width, height = IMAGE_PIPELINE.process(path).size
+    scale = min(limit / max(width, height), 1)
+
+    return IMAGE_PIPELINE.process(
+        path, size=(max(int(width * scale), 1), max(int(height * scale), 1))
+    )
+
+
+def render_sleeve_preview(
+    path: str, border_color: str | None, fade: bool, limit: int = 374
+) -> Image.Image:
+    """
+    Renders the sleeve a replacement would create, on a proxy of the user image.
+
+    :param path: Path to the user image
+    :param border_color: Border color, None for no border
+    :param fade: Whether the border fades into the image content
+    :param limit: Largest side of the proxy image, in pixels
+    :return: The preview image
+    """
+
+    img = render_proxy(path, limit)
+
+    if border_color:
+        if fade:
+            return add_sleeve_border_with_fade(img, border_color)
+        return add_sleeve_border(img, border_color)
+
+    return img
+
+
+def render_card_preview(path: str, frame: Image.Image, limit: int = 374) -> Image.Image:
+    """
+    Renders the large card texture a replacement would create, with the user image
+    pasted over the card art area of the given frame.
+
+    :param path: Path to the user image
+    :param frame: Current large texture of the card
+    :param limit: Largest side of the preview image, in pixels
+    :return: The preview image
+    """
+
+    coordinates = CardArtCoordinates.LARGE.value
+    art = IMAGE_PIPELINE.process(
+        path,
+        size=(coordinates[2] - coordinates[0], coordinates[3] - coordinates[1]),
+    )
+
+    img = frame.copy()
+    img.paste(art, (coordinates[0], coordinates[1]))
+    img.thumbnail((limit, limit), Image.Resampling.BILINEAR)
+
+    return img
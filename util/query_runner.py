@@ -0,0 +1,109 @@
+"""
+Background database queries for the search box.
+Queries matching most of the cards take around a second, so they run on a worker thread
+with its own session. Like the previews, only the latest request is run: a newer one
+interrupts the SQLite statement still running and stale results are never delivered.
+"""
+
+import logging
+from threading import Condition, Thread
+from typing import Callable
+
+from PySide6.QtCore import QObject, Signal
+from sqlalchemy.orm import Session
+
+from database.objects import DBsession
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRunner(QObject):
+    """
+    Runs queries on a worker thread, keeping only the most recent request.
+
+    Signals:
+        ready: Emitted on the GUI thread with the result of the latest finished query
+        failed: Emitted on the GUI thread with the error of the latest query, if it raised
+    """
+
+    ready = Signal(object)
+    failed = Signal(object)
+    _finished = Signal(int, object)
+    _errored = Signal(int, object)
+
+    def __init__(self):
+        super().__init__()
+        self._condition = Condition()
+        self._pending: tuple[int, Callable[[Session], object]] | None = None
+        self._generation = 0
+        # SQLite connection of the running query, interrupted by a newer request
+        self._connection = None
+
+        self._finished.connect(self._deliver)
+        self._errored.connect(self._deliver_error)
+
+        Thread(target=self._work, daemon=True).start()
+
+    def request(self, query: Callable[[Session], object]) -> None:
+        """
+        Schedules a query, replacing any request that has not finished yet.
+
+        :param query: Callable given the session of the worker and returning the result
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, query)
+            self._interrupt()
+            self._condition.notify()
+
+    def cancel(self) -> None:
+        """Drops the pending request and interrupts the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._interrupt()
+
+    def _interrupt(self) -> None:
+        # sqlite3 allows interrupting a connection from another thread
+        if self._connection is not None:
+            self._connection.interrupt()
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, query = self._pending
+                self._pending = None
+
+            try:
+                result = self._run(query)
+            except Exception as e:
+                # Interrupted queries fail too, only the current one is reported
+                if generation == self._generation:
+                    logger.error(f"Query failed: {e}")
+                    self._errored.emit(generation, e)
+                continue
+
+            if generation == self._generation:
+                self._finished.emit(generation, result)
+
+    def _run(self, query: Callable[[Session], object]):
+        db_session = DBsession()
+        try:
+            with self._condition:
+                self._connection = db_session.connection().connection.dbapi_connection
+            return query(db_session)
+        finally:
+            with self._condition:
+                self._connection = None
+            db_session.close()
+
+    def _deliver(self, generation: int, result) -> None:
+        # Checked again on the GUI thread, a newer request may have arrived meanwhile
+        if generation == self._generation:
+            self.ready.emit(result)
+
+    def _deliver_error(self, generation: int, error: Exception) -> None:
+        if generation == self._generation:
+            self.failed.emit(error)
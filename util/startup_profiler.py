@@ -0,0 +1,161 @@
+"""
+Startup instrumentation.
+This module records the wall and CPU time of the startup phases (imports, migrations,
+page construction, model refreshes...) and writes them as a Chrome trace, which can be
+opened in chrome://tracing or https://ui.perfetto.dev, when the FLOOWANDEREEZE_PROFILE
+environment variable is set. The variable holds the path of the trace file, or "1" to use
+the default one. Nothing is recorded otherwise.
+
+Only the standard library is used, so it can be imported before anything else.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterator
+
+# Where the trace is written when the environment variable doesn't hold a path
+DEFAULT_TRACE_PATH: str = os.path.join("reports", "startup_trace.json")
+
+
+class StartupProfiler:
+    """
+    Records timed phases as Chrome trace complete events.
+
+    Attributes:
+        enabled: Whether phases are recorded
+        path: Where the trace is written
+    """
+
+    def __init__(self, setting: str | None):
+        self.enabled = bool(setting)
+        self.path = DEFAULT_TRACE_PATH if setting in (None, "", "1") else setting
+        self._start = time.perf_counter()
+        self._events: list[dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times the enclosed block as a phase.
+
+        :param name: Name of the phase in the trace
+        """
+        if not self.enabled:
+            yield
+            return
+
+        wall, cpu, thread_cpu = (
+            time.perf_counter(),
+            time.process_time(),
+            time.thread_time(),
+        )
+        try:
+            yield
+        finally:
+            self._add(
+                name,
+                wall,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+                time.thread_time() - thread_cpu,
+            )
+
+    def profiled(self, name: str | None = None) -> Callable:
+        """
+        Decorator timing every call of the decorated function as a phase.
+
+        :param name: Name of the phase, defaults to the qualified name of the function
+        """
+
+        def decorator(function: Callable) -> Callable:
+            label = name or function.__qualname__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.phase(label):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def mark_since_start(self, name: str) -> None:
+        """
+        Records a phase going from the import of this module until now, used for the
+        imports done before anything else could be timed.
+
+        :param name: Name of the phase in the trace
+        """
+        if self.enabled:
+            self._add(name, self._start, time.perf_counter() - self._start, None, None)
+
+    def write(self) -> str | None:
+        """
+        Writes the recorded phases, along with a summary per phase name.
+
+        :return: The path of the trace, None when profiling is disabled
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            events = list(self._events)
+
+        summary: dict[str, dict[str, float]] = {}
+        for event in events:
+            phase = summary.setdefault(
+                event["name"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0}
+            )
+            phase["calls"] += 1
+            phase["wall_ms"] += event["dur"] / 1000
+            phase["cpu_ms"] += event["args"].get("thread_cpu_ms", 0.0)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "summary": summary,
+                },
+                f,
+                indent=1,
+            )
+
+        return self.path
+
+    def _add(
+        self,
+        name: str,
+        start: float,
+        wall: float,
+        cpu: float | None,
+        thread_cpu: float | None,
+    ) -> None:
+        args = {"wall_ms": round(wall * 1000, 3)}
+        if cpu is not None:
+            args["process_cpu_ms"] = round(cpu * 1000, 3)
+            args["thread_cpu_ms"] = round(thread_cpu * 1000, 3)
+
+        with self._lock:
+            self._events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((start - self._start) * 1_000_000),
+                    "dur": round(wall * 1_000_000),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+            )
+
+
+# Global profiler, enabled by the FLOOWANDEREEZE_PROFILE environment variable
+STARTUP_PROFILER: StartupProfiler = StartupProfiler(
+    os.environ.get("FLOOWANDEREEZE_PROFILE")
+)
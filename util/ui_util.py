@@ -4,12 +4,35 @@ This module provides functions for UI-related tasks like showing toasts
 and managing the application's color palette.
 """
 
+from typing import Callable
+
 from PySide6.QtGui import QPalette, QColor
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QEvent, QObject, Qt
 from pyqttoast import Toast, ToastPreset
 
 
-def show_toast(parent, title: str, text: str, preset: ToastPreset):
+class _ToastClickFilter(QObject):
+    """Calls the action of a toast when it is clicked, then closes it."""
+
+    def __init__(self, toast: Toast, on_click: Callable[[], None]):
+        super().__init__(toast)
+        self.on_click = on_click
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Type.MouseButtonPress:
+            watched.hide()
+            self.on_click()
+            return True
+        return False
+
+
+def show_toast(
+    parent,
+    title: str,
+    text: str,
+    preset: ToastPreset,
+    on_click: Callable[[], None] | None = None,
+):
     """
     Show a toast notification to the user.
 
@@ -18,6 +41,7 @@ def show_toast(parent, title: str, text: str, preset: ToastPreset):
         title: The title text of the toast
         text: The main text content of the toast
         preset: The visual preset to apply to the toast
+        on_click: Action offered by the toast, run if the user clicks it
     """
     toast = Toast(parent)
     toast.setDuration(5000)
@@ -25,6 +49,8 @@ def show_toast(parent, title: str, text: str, preset: ToastPreset):
     toast.setTitle(title)
     toast.setText(text)
     toast.applyPreset(preset)
+    if on_click is not None:
+        toast.installEventFilter(_ToastClickFilter(toast, on_click))
     toast.show()
 
 